@@ -8,7 +8,7 @@ import os
 load_dotenv()
 db = DbManagerV1("jp_realestate_v1")
 agent_db = AgentMemory()
-runtime  = AgentRuntime(db.conn)
+runtime  = AgentRuntime()
 
 def reduce_state(state):
     results = state.get("results") or []
@@ -58,5 +58,3 @@ if __name__ == "__main__":
         response,fillers = real_estate_agent(user_input,_thread_id)
         print(f"ai : {response}")
         print(f"fillers : {fillers}")
-    agent_db.close_conn()
-    db.close_conn()
@@ -44,7 +44,7 @@ class AgentRuntime:
     _checkpointer = None
     _db = None
 
-    def __init__(self, conn):
+    def __init__(self, conn = None): # conn = None : the search node borrows from the shared pool
 
         if AgentRuntime._checkpointer is None:
             db_url = (
@@ -3,7 +3,6 @@ from ai_agent.state import AgentState
 
 #for test
 from ai_agent.llm_wrappers import OpenRouterLLM
-from manage_db.db_manager_v1 import DbManagerV1
 
 def make_search_executor(conn,table_name:str):
     def search_executor(state:AgentState) -> AgentState:
@@ -22,11 +21,7 @@ if __name__ == "__main__":
     )
     llm = OpenRouterLLM("openrouter/owl-alpha")#openrouter/free
 
-    db = DbManagerV1(table_name="jp_realestate_v1")
-    conn = db.conn
-
-
-    sercher = make_search_executor(conn,table_name="jp_realestate_v1")
+    sercher = make_search_executor(None,table_name="jp_realestate_v1")
     state1 = sercher(state0)
 
     print(state1.results)
\ No newline at end of file
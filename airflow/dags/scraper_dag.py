@@ -11,19 +11,21 @@ default_args = {
     'retry_delay': timedelta(minutes=5),
 }
 
-def scrape_listing(max_page: int, building_type=None):
+def scrape_listing(max_page: int, building_type=None, incremental=True):
     print(
-        f"Starting scraper: max_page={max_page}, type={building_type}"
+        f"Starting scraper: max_page={max_page}, type={building_type}, incremental={incremental}"
     )
 
-    payload = {
+    # the endpoint reads query params , None values are left out by requests
+    params = {
         "building_type": building_type,
         "max_page": max_page,
+        "incremental": incremental,
     }
 
     response = requests.post(
         "http://backend:8000/scraper/scrape_listing_af",
-        json=payload,
+        params=params,
         timeout=600,
     )
 
@@ -46,8 +48,10 @@ with DAG(
         task_id="scrape_realestate_co",
         python_callable=scrape_listing,
         op_kwargs={
-            "max_page": 5,
+            # incremental stops at the first fully known page , max_page is only a cap
+            "max_page": 20,
             "building_type": None,
+            "incremental": True,
         },
         max_active_tis_per_dag=1,
     )
\ No newline at end of file
@@ -68,7 +68,6 @@ async def auth_callback(request:Request):
     google_sub = user_info["sub"]
     db = UserDbManager()
     user_id = db.insert_user(email,google_sub)
-    db.close_conn()
 
     jwt_token = create_jwt(str(user_id))
 
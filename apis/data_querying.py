@@ -1,14 +1,15 @@
 from fastapi import FastAPI
 from fastapi import APIRouter
-from fastapi import Request
+from fastapi import Request,Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from manage_db.db_manager_v1 import DbManagerV1
+from manage_db.pool import get_pool,close_pool,make_async_pool
 from ai_agent.agent_runtime import AgentRuntime
 
-from manage_db.query import PropertyQuery ,query_property
+from manage_db.query import PropertyQuery ,query_property ,query_property_async ,get_property_async ,get_options_async
 
 from utils.logger import get_logger
 
@@ -17,40 +18,45 @@ api_log = get_logger("API_log","api")
 
 @asynccontextmanager
 async def lifespan(app:FastAPI):
+    get_pool().open()
+    app.state.async_pool = make_async_pool()
+    await app.state.async_pool.open()
     db = DbManagerV1(table_name="jp_realestate_v1")
 
     app.state.db = db
 
     api_log.info("Database connected.")
 
-    app.state.agent_runtime = AgentRuntime(
-        db.conn
-    )
+    app.state.agent_runtime = AgentRuntime()
 
     api_log.info("AgentRuntime loaded.")
     api_log.info("Application started")
 
     yield
 
-    db.close_conn()
+    await app.state.async_pool.close()
+    close_pool()
     api_log.info("Application shutdown complete")
 
 
 @router.post("/search")
-def search(q: PropertyQuery,request : Request):
+async def search(q: PropertyQuery,request : Request,response : Response):
     api_log.info(f"Received query: {q}")
     try:
-        results = query_property(q,"jp_realestate_v1",request.app.state.db.conn)
+        results,next_cursor = await query_property_async(q,"jp_realestate_v1",request.app.state.async_pool)
+        if next_cursor:
+            # send it back as PropertyQuery.cursor to get the next page
+            response.headers["X-Next-Cursor"] = next_cursor
         return jsonable_encoder(results)
     except Exception as e:
         api_log.exception("Search failed")
         return {"error": str(e)} #todo : switch to http errors
 
 @router.get("/property/{property_id}")
-def get_property(property_id:int,request : Request):
+async def get_property(property_id:int,request : Request):
     api_log.info(f"Received request for id : {property_id}")
     try:
-        property_data = request.app.state.db.get_by_id(property_id)
+        property_data = await get_property_async(property_id,request.app.state.async_pool)
         if not property_data:
             return {"error": "property not found"}
 
@@ -64,11 +70,11 @@ def get_property(property_id:int,request : Request):
         return {"error": str(e)}
 
 @router.get("/options/{column_name}")
-def get_options(column_name:str,request : Request):
+async def get_options(column_name:str,request : Request):
     api_log.info(f"Received options request for column : {column_name}")
     try:
-        rows = request.app.state.db.get_options(column_name)
-        options = [row[0] for row in rows if row[0]]
+        # async pool like /search , no threadpool token is held while waiting for a connection
+        options = await get_options_async(column_name,"jp_realestate_v1",request.app.state.async_pool)
 
         return {
             "column_name":column_name,
@@ -81,15 +87,12 @@ def get_options(column_name:str,request : Request):
 
 if __name__ == "__main__":
     #__test__
-    db = DbManagerV1(table_name="jp_realestate_v1")
-    conn = db.conn
-
     q = PropertyQuery(
         max_price=400000000,
         min_size=40,
         limit=2
     )
-    results = query_property(q , "jp_realestate_v1" , conn)
+    results = query_property(q , "jp_realestate_v1")
     data = jsonable_encoder(results)
 
     print(JSONResponse(content=data).body)
@@ -5,6 +5,7 @@ from apis.auth import router as auth_router
 from apis.agent_api import router as agent_router
 from apis.user_pref_api import router as pref_router
 from apis.scrapers_api import router as scraper_router
+from manage_db.pool import get_pool
 
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
@@ -25,10 +26,16 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 app.include_router(query_router,prefix="/query")
 app.include_router(auth_router,prefix="/auth")
 app.include_router(agent_router,prefix="/agent")
 app.include_router(pref_router,prefix="/pref")
-app.include_router(scraper_router,prefix="/scraper")
\ No newline at end of file
+app.include_router(scraper_router,prefix="/scraper")
+
+@app.get("/health/db_pool")
+def db_pool_metrics():
+    # checked_out / waiting / wait_time_* are the numbers to watch when sizing DB_POOL_MAX_SIZE
+    return get_pool().metrics()
\ No newline at end of file
@@ -5,6 +5,7 @@ from fastapi import APIRouter, BackgroundTasks,status
 from scraper.japan.realestate.runner import RealestateScraperRunner
 from scraper.japan.realestate.updater import UpdateRealEstate
 from scraper.japan.realestate.metadataupdater import MetaDataUpdater
+from scraper.core.rate_limiter import limiter_metrics
 
 from utils.logger import get_logger
 
@@ -12,12 +13,12 @@ scp_log = get_logger("ScraperApi" , "api")
 router = APIRouter()
 
 @router.post("/scrape_listing",status_code=status.HTTP_202_ACCEPTED)
-def scrape_listing(background_task : BackgroundTasks, building_type=None,max_page: int = 5):
-    scp_log.info(f"starting scraper with args building type = {building_type} , max_page = {max_page}")
+def scrape_listing(background_task : BackgroundTasks, building_type=None,max_page: int = 5,incremental: bool = False):
+    scp_log.info(f"starting scraper with args building type = {building_type} , max_page = {max_page} , incremental = {incremental}")
     scraper = RealestateScraperRunner()
 
     def run_scraper():
-        task = scraper.run(building_type=building_type,max_pages=max_page)
+        task = scraper.run(building_type=building_type,max_pages=max_page,incremental=incremental)
         asyncio.run(task)
         scp_log.info(f"scraping completed for {max_page} pages")
 
@@ -50,22 +51,29 @@ def update_metadata(background_task: BackgroundTasks, batch_wise: bool = True, m
     background_task.add_task(run_status_updater)
     return {"message": "metadata updater started in the background"}
 
+@router.get("/limiter",status_code=status.HTTP_200_OK)
+def get_limiter_metrics():
+    # current concurrency limit and smoothed latency per domain of every running scraper / updater
+    return {"limiters": limiter_metrics()}
+
 # --For airflow--
 @router.post("/scrape_listing_af", status_code=status.HTTP_200_OK)
 async def scrape_listing_af(
     building_type=None,
-    max_page: int = 5
+    max_page: int = 5,
+    incremental: bool = False
 ):
     scp_log.info(
         f"Starting Airflow scraper with args "
-        f"building type={building_type}, max_page={max_page}"
+        f"building type={building_type}, max_page={max_page}, incremental={incremental}"
     )
 
     scraper = RealestateScraperRunner()
 
     await scraper.run(
         building_type=building_type,
-        max_pages=max_page
+        max_pages=max_page,
+        incremental=incremental
     )
 
     scp_log.info(
@@ -74,7 +82,8 @@ async def scrape_listing_af(
 
     return {
         "message": "scraper completed",
-        "max_pages": max_page
+        "max_pages": max_page,
+        "incremental": incremental
     }
 
 
@@ -6,14 +6,12 @@ from manage_db.user_pref_db_manager import UserPreference , Preference
 api_log = get_logger("UserPref","api")
 
 router = APIRouter()
-
-#todo : store the db conn in lifespan
+db = UserPreference() # borrows pooled connections per call , safe to share
 
 @router.post("/insert_user_pref")
 def insert_user_pref(pref : Preference):
     api_log.info("Received preference")
     try :
-        db = UserPreference()
         _id = db.insert_pref(pref)
         api_log.info(f"Inserted pref for user : {_id}")
         return {
@@ -28,7 +26,6 @@ def insert_user_pref(pref : Preference):
 def update_user_pref(pref : Preference):
     api_log.info("Received preference update request.")
     try:
-        db = UserPreference()
         _id = db.update_pref(pref)
         api_log.info(f"Preference updated for user : {_id}")
         return {
@@ -44,7 +41,6 @@ def update_user_pref(pref : Preference):
 def get_user_pref(user_id:str):
     api_log.info(f"Received request to get user preference of : {user_id}")
     try:
-        db = UserPreference()
         data = db.get_pref(user_id)
         return data
     except Exception as e :
@@ -0,0 +1,55 @@
+import time
+import random
+
+from manage_db.db_manager_v1 import DbManagerV1
+
+# Compares rows/sec of the per-row insert_data path against insert_data_bulk.
+# Runs against a scratch table so the real listing table is never touched.
+# usage : python -m benchmarks.bench_insert_data
+
+BENCH_TABLE = "bench_listing_insert"
+SIZES = [100, 1_000, 50_000]
+
+
+def make_listings(n, offset=0):
+    listings = []
+    for i in range(n):
+        listings.append({
+            "price_yen": random.randint(5_000_000, 500_000_000),
+            "source_listing_id": str(offset + i),
+            "size": round(random.uniform(15, 300), 2),
+            "layout": random.choice(["1LDK", "2LDK", "3LDK", "Whole Building"]),
+            "prefecture": random.choice(["Tokyo", "Osaka", "Kanagawa", "Hyogo"]),
+            "city": "Setagaya-ku",
+            "district": "Akatsutsumi",
+            "building_description": "Looking for an English-speaking real estate broker in Tokyo? " * 5,
+        })
+    return listings
+
+
+def run_case(db, method, listings):
+    db.reset_table()
+    start = time.perf_counter()
+    ids = method(listings)
+    elapsed = time.perf_counter() - start
+    assert len(ids) == len(listings)
+    return len(listings) / elapsed
+
+
+def main():
+    db = DbManagerV1(BENCH_TABLE, "bench")
+    db.create_table()
+
+    try:
+        print(f"{'rows':>8} | {'insert_data rows/s':>20} | {'insert_data_bulk rows/s':>24} | {'speedup':>7}")
+        for size in SIZES:
+            listings = make_listings(size)
+            old = run_case(db, db.insert_data, listings)
+            new = run_case(db, db.insert_data_bulk, listings)
+            print(f"{size:>8} | {old:>20.0f} | {new:>24.0f} | {new / old:>6.1f}x")
+    finally:
+        db.drop_table()
+
+
+if __name__ == "__main__":
+    main()
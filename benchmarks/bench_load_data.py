@@ -0,0 +1,40 @@
+import sys
+import time
+import tracemalloc
+
+from manage_db.db_manager_v1 import DbManagerV1
+
+# Time and peak python memory of load_data (jsonb_each_text + pandas pivot) against
+# load_wide_data (materialized view) on the same table .
+# usage : python -m benchmarks.bench_load_data [table_name]
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = load()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak / 1024 / 1024
+
+
+def main():
+    table_name = sys.argv[1] if len(sys.argv) > 1 else "jp_realestate_v1"
+    db = DbManagerV1(table_name, "bench")
+    db.create_wide_view()
+    db.refresh_wide_view()
+
+    cases = {
+        "load_data": lambda: db.load_data(include_expired=True),
+        "load_wide_data": lambda: db.load_wide_data(include_expired=True),
+    }
+
+    print(f"{'loader':>15} | {'rows':>7} | {'cols':>5} | {'seconds':>8} | {'peak MiB':>9}")
+    for name, load in cases.items():
+        df, elapsed, peak = measure(load)
+        print(f"{name:>15} | {len(df):>7} | {len(df.columns):>5} | {elapsed:>8.2f} | {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import time
+
+from playwright.async_api import async_playwright
+
+from scraper.core.page_pool import PagePool
+from scraper.core.resource_policy import ResourcePolicy
+from scraper.japan.realestate.data_extractor import extract_listing
+from benchmarks.bench_resource_blocking import HAR_PATH, URLS_PATH
+
+# Pages/min of new_page() + close() per listing against PagePool reuse , replayed from the HAR
+# fixture of bench_resource_blocking (record it first with --record) .
+# usage : python -m benchmarks.bench_page_pool --visits 200 --concurrency 5
+
+
+async def new_context(browser):
+    context = await browser.new_context()
+    await context.route_from_har(str(HAR_PATH), not_found="abort")
+    await ResourcePolicy().apply(context)
+    return context
+
+
+async def visit(page, url):
+    await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+    await extract_listing(page)
+
+
+async def run_new_page(context, urls, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def task(url):
+        async with sem:
+            page = await context.new_page()
+            try:
+                await visit(page, url)
+            finally:
+                await page.close()
+
+    await asyncio.gather(*(task(url) for url in urls))
+
+
+async def run_pool(context, urls, concurrency):
+    pool = PagePool(context, max_size=concurrency)
+    await pool.warm(concurrency)
+
+    async def task(url):
+        async with pool.page() as page:
+            await visit(page, url)
+
+    await asyncio.gather(*(task(url) for url in urls))
+    print(f"{'':>10}   pool metrics : {pool.metrics()}")
+    await pool.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--visits", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    fixture_urls = json.loads(URLS_PATH.read_text())
+    urls = [fixture_urls[i % len(fixture_urls)] for i in range(args.visits)]
+
+    cases = {"new_page": run_new_page, "PagePool": run_pool}
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        try:
+            print(f"{'mode':>10} | {'visits':>6} | {'seconds':>8} | {'pages/min':>9}")
+            for name, run in cases.items():
+                context = await new_context(browser)
+                start = time.perf_counter()
+                await run(context, urls, args.concurrency)
+                elapsed = time.perf_counter() - start
+                await context.close()
+                print(f"{name:>10} | {len(urls):>6} | {elapsed:>8.2f} | {len(urls) / elapsed * 60:>9.1f}")
+        finally:
+            await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
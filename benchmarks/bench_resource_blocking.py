@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from scraper.core.resource_policy import ResourcePolicy
+from scraper.japan.realestate.xpaths import CARDS
+from scraper.japan.realestate.data_extractor import extract_listing
+
+# Bandwidth and pages/min of listing scraping with and without the ResourcePolicy ,
+# replayed from a recorded HAR so both runs see the exact same responses .
+# record once (live site) : python -m benchmarks.bench_resource_blocking --record --pages 20
+# then replay            : python -m benchmarks.bench_resource_blocking
+
+FIXTURES = Path(__file__).parent / "fixtures"
+HAR_PATH = FIXTURES / "realestate_listings.har.zip"
+URLS_PATH = FIXTURES / "realestate_listings.json"
+
+LIST_URL = "https://realestate.co.jp/en/forsale?order=date_entered_ranking-desc&page=1"
+
+
+async def record(browser, pages):
+    FIXTURES.mkdir(exist_ok=True)
+    context = await browser.new_context(record_har_path=str(HAR_PATH), record_har_content="attach")
+    page = await context.new_page()
+
+    await page.goto(LIST_URL, wait_until="domcontentloaded")
+    cards = await page.query_selector_all(CARDS)
+    ids = [(await card.get_attribute("id")).removeprefix("property-") for card in cards][:pages]
+    urls = [f"https://realestate.co.jp/en/forsale/view/{id_}" for id_ in ids]
+
+    for url in urls:
+        await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+        await extract_listing(page)
+
+    await context.close()  # flushes the har
+    URLS_PATH.write_text(json.dumps(urls, indent=2))
+    print(f"Recorded {len(urls)} listings into {HAR_PATH}")
+
+
+async def replay(browser, urls, policy):
+    context = await browser.new_context()
+    await context.route_from_har(str(HAR_PATH), not_found="abort")
+    if policy:
+        await policy.apply(context)  # registered last , so it runs before the har route
+
+    transferred = 0
+    requests = 0
+
+    async def on_finished(request):
+        nonlocal transferred, requests
+        sizes = await request.sizes()
+        transferred += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        requests += 1
+
+    context.on("requestfinished", on_finished)
+    page = await context.new_page()
+
+    start = time.perf_counter()
+    for url in urls:
+        await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+        await extract_listing(page)
+    elapsed = time.perf_counter() - start
+
+    await context.close()
+    return transferred, requests, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", action="store_true", help="record the fixture from the live site")
+    parser.add_argument("--pages", type=int, default=20)
+    args = parser.parse_args()
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        try:
+            if args.record:
+                await record(browser, args.pages)
+                return
+
+            urls = json.loads(URLS_PATH.read_text())
+            cases = {"no blocking": None, "ResourcePolicy": ResourcePolicy()}
+
+            print(f"{'mode':>15} | {'requests':>8} | {'MiB':>7} | {'pages/min':>9}")
+            for name, policy in cases.items():
+                transferred, requests, elapsed = await replay(browser, urls, policy)
+                print(f"{name:>15} | {requests:>8} | {transferred / 1024 / 1024:>7.2f} | {len(urls) / elapsed * 60:>9.1f}")
+        finally:
+            await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
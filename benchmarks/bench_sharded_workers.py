@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Listings/sec of the sharded scraper at 1 , 2 , 4 and 8 worker processes against a local fixture
+# server (synthetic results + listing pages , fixed per-request latency) . Writes to a scratch table
+# and its own frontier source , both removed at the end .
+# usage : python -m benchmarks.bench_sharded_workers [pages]
+
+HOST, PORT = "127.0.0.1", 8765
+os.environ["REALESTATE_BASE_URL"] = f"http://{HOST}:{PORT}"  # read at import by the scraper , inherited by workers
+
+from manage_db.db_manager_v1 import DbManagerV1
+from manage_db.frontier_db_manager import CrawlFrontier
+from scraper.japan.realestate.workers import ScraperCoordinator
+
+BENCH_TABLE = "bench_listing_workers"
+BENCH_SOURCE = "bench-fixture"
+CARDS_PER_PAGE = 20
+LATENCY_SEC = 0.05
+WORKERS = [1, 2, 4, 8]
+
+# bumped per round so every round sees fresh listing ids
+ROUND = {"n": 0}
+
+
+def results_page(page_no):
+    cards = "".join(
+        f'<div id="property-{ROUND["n"]}{page_no:04d}{i:02d}"><img src="/t.jpg"><p>¥{(i + 1) * 1_000_000:,}</p></div>'
+        for i in range(CARDS_PER_PAGE)
+    )
+    return f"<html><body>{cards}</body></html>"
+
+
+def listing_page(listing_id):
+    return f"""<html><body>
+    <h4 class="text-xl">District-{listing_id}, Setagaya-ku, Tokyo</h4>
+    <div class="property-details"><span class="property-details-title">Size</span><span class="property-details-content">{50 + int(listing_id) % 100} m²</span></div>
+    <div class="property-details"><span class="property-details-title">Type</span><span class="property-details-content">Apartment</span></div>
+    <div class="property-additional-details"><div class="property-additional-details-title">Price</div><div class="property-additional-details-content">¥35,000,000</div></div>
+    <div class="property-additional-details"><div class="property-additional-details-title">Layout</div><div class="property-additional-details-content">2LDK</div></div>
+    <h4 class="font-semibold text-2xl">Building Description</h4><div>Fixture listing {listing_id}</div>
+    </body></html>"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY_SEC)
+        url = urlsplit(self.path)
+        if url.path.startswith("/en/forsale/view/"):
+            body = listing_page(url.path.rsplit("/", 1)[-1])
+        elif url.path == "/en/forsale":
+            body = results_page(int(parse_qs(url.query).get("page", ["1"])[0]))
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def reset(db, frontier):
+    db.drop_table()
+    with db.cursor(cursor_factory=None) as cur:
+        cur.execute("DELETE FROM crawl_frontier WHERE source = %s;", (BENCH_SOURCE,))
+        cur.execute("DELETE FROM crawl_cursor WHERE source = %s;", (BENCH_SOURCE,))
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    server = ThreadingHTTPServer((HOST, PORT), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    db = DbManagerV1(BENCH_TABLE, BENCH_SOURCE)
+    frontier = CrawlFrontier(BENCH_SOURCE)
+    frontier.create_tables()
+
+    try:
+        print(f"{'workers':>7} | {'listings':>8} | {'drain s':>8} | {'listings/s':>10}")
+        for processes in WORKERS:
+            ROUND["n"] += 1
+            reset(db, frontier)
+            db.create_table()
+
+            coordinator = ScraperCoordinator(
+                processes=processes, idle_sec=2, report_sec=0.5, table_name=BENCH_TABLE, source=BENCH_SOURCE
+            )
+            stats = asyncio.run(coordinator.run(max_pages=pages))
+            done = stats["progress"]["done"]
+            drained = stats.get("drained_after", stats["elapsed"])
+            print(f"{processes:>7} | {done:>8} | {drained:>8.1f} | {done / drained:>10.1f}")
+    finally:
+        reset(db, frontier)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import sys
+import time
+import asyncio
+
+from manage_db.db_manager_v1 import DbManagerV1
+from benchmarks.bench_insert_data import make_listings
+
+# Listings/min of one 100-listing updater batch : per-listing update_status + update_last_update
+# on the event loop thread (old path) against collected outcomes flushed with update_status_bulk
+# through asyncio.to_thread . Page loads are simulated with a fixed latency so only the write path differs .
+# usage : python -m benchmarks.bench_updater_writes [page_latency_sec] [concurrency]
+
+BENCH_TABLE = "bench_listing_updater"
+BATCH_SIZE = 100
+
+
+async def run_inline(db, listing_ids, latency, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def task(i, listing_id):
+        async with sem:
+            await asyncio.sleep(latency)
+            db.update_status(listing_id, "expired" if i % 10 == 0 else "active")
+            db.update_last_update(listing_id)
+
+    await asyncio.gather(*(task(i, listing_id) for i, listing_id in enumerate(listing_ids)))
+
+
+async def run_batched(db, listing_ids, latency, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    outcomes = []
+
+    async def task(i, listing_id):
+        async with sem:
+            await asyncio.sleep(latency)
+            outcomes.append((listing_id, "expired" if i % 10 == 0 else "active"))
+
+    await asyncio.gather(*(task(i, listing_id) for i, listing_id in enumerate(listing_ids)))
+    await asyncio.to_thread(db.update_status_bulk, outcomes)
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    db = DbManagerV1(BENCH_TABLE, "bench")
+    db.create_table()
+
+    try:
+        db.reset_table()
+        listing_ids = list(db.insert_data_bulk(make_listings(BATCH_SIZE)).values())
+
+        print(f"{'mode':>8} | {'listings':>8} | {'seconds':>8} | {'listings/min':>12}")
+        for name, run in {"inline": run_inline, "batched": run_batched}.items():
+            start = time.perf_counter()
+            asyncio.run(run(db, listing_ids, latency, concurrency))
+            elapsed = time.perf_counter() - start
+            print(f"{name:>8} | {len(listing_ids):>8} | {elapsed:>8.2f} | {len(listing_ids) / elapsed * 60:>12.0f}")
+    finally:
+        db.drop_table()
+
+
+if __name__ == "__main__":
+    main()
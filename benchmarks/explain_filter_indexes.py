@@ -0,0 +1,93 @@
+import sys
+import json
+
+from psycopg2 import sql
+
+from manage_db.db_manager_v1 import DbManagerV1
+from manage_db.query import PropertyQuery, build_property_query
+
+# EXPLAIN check : the common search filter combinations must not seq scan the listing table.
+# Builds a 500k row synthetic table with the same schema + filter indexes , then inspects the plans
+# build_property_query produces . Exits 1 if any plan seq scans the table .
+# usage : python -m benchmarks.explain_filter_indexes [rows]
+
+BENCH_TABLE = "bench_listing_filters"
+
+COMBINATIONS = {
+    "prefecture": PropertyQuery(prefecture="Pref-7"),
+    "prefecture + city": PropertyQuery(prefecture="Pref-7", city="City-7-3"),
+    "city + price range": PropertyQuery(city="City-12-5", min_price=20_000_000, max_price=80_000_000),
+    "district": PropertyQuery(district="District-120-4"),
+    "size range": PropertyQuery(min_size=250, max_size=260),
+    "prefecture + size": PropertyQuery(prefecture="Pref-3", min_size=100, max_size=120),
+    "zoning + structure + occupancy": PropertyQuery(zoning="Zone-2", structure="Structure-1", occupancy="Vacant"),
+    "price range": PropertyQuery(min_price=100_000_000, max_price=110_000_000),
+}
+
+
+def populate(db, rows):
+    query = sql.SQL("""
+    INSERT INTO {table} (source, source_listing_id, price_yen, status, data)
+    SELECT
+        'bench',
+        g::text,
+        (random() * 500000000)::bigint,
+        CASE WHEN mod(g, 10) = 0 THEN 'expired' ELSE 'active' END,
+        jsonb_build_object(
+            'prefecture', 'Pref-' || mod(g, 47),
+            'city', 'City-' || mod(g, 47) || '-' || mod(g, 20),
+            'district', 'District-' || mod(g, 1000) || '-' || mod(g, 7),
+            'zoning', 'Zone-' || mod(g, 6),
+            'structure', 'Structure-' || mod(g, 5),
+            'occupancy', CASE WHEN mod(g, 3) = 0 THEN 'Occupied' ELSE 'Vacant' END,
+            'size', round((15 + random() * 285)::numeric, 2),
+            'layout', (1 + mod(g, 4)) || 'LDK'
+        )
+    FROM generate_series(1, %s) AS g;
+    """).format(table=sql.Identifier(BENCH_TABLE))
+
+    with db.cursor(cursor_factory=None) as cur:
+        cur.execute(query, (rows,))
+
+
+def seq_scanned(plan, table):
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") == table:
+        return True
+    return any(seq_scanned(child, table) for child in plan.get("Plans", []))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    db = DbManagerV1(BENCH_TABLE, "bench")
+
+    failed = []
+    try:
+        db.drop_table()
+        db.create_table()  # table + price index
+        populate(db, rows)
+        db.create_filter_indexes()  # migration step : builds the filter / sort indexes , then ANALYZE
+
+        for name, q in COMBINATIONS.items():
+            query, params = build_property_query(q, BENCH_TABLE)
+            with db.cursor(cursor_factory=None) as cur:
+                cur.execute(sql.SQL("EXPLAIN (FORMAT JSON) ") + query, params)
+                plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plan = plan[0]["Plan"]
+
+            status = "SEQ SCAN" if seq_scanned(plan, BENCH_TABLE) else "ok"
+            if status != "ok":
+                failed.append(name)
+            print(f"{name:>32} | {status:>8} | est. cost {plan['Total Cost']:.0f}")
+    finally:
+        db.drop_table()
+
+    if failed:
+        print(f"Sequential scans on {BENCH_TABLE} for : {failed}")
+        sys.exit(1)
+    print(f"No sequential scans on {BENCH_TABLE} ({rows} rows).")
+
+
+if __name__ == "__main__":
+    main()
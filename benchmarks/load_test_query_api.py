@@ -0,0 +1,80 @@
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# p50/p99 latency of the /query routes at 1 , 16 and 64 concurrent clients.
+# Needs the api running , eg : uvicorn apis.main_api:app --port 8000
+# usage : python -m benchmarks.load_test_query_api --base-url http://localhost:8000
+
+CONCURRENCY = [1, 16, 64]
+
+
+def make_requests(base_url, property_id):
+    search_body = json.dumps({
+        "max_price": 400_000_000,
+        "min_size": 40,
+        "limit": 20
+    }).encode()
+
+    return [
+        ("search", lambda: urllib.request.Request(
+            f"{base_url}/query/search",
+            data=search_body,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )),
+        ("property", lambda: urllib.request.Request(f"{base_url}/query/property/{property_id}")),
+        ("options", lambda: urllib.request.Request(f"{base_url}/query/options/prefecture")),
+    ]
+
+
+def timed_call(make_request):
+    start = time.perf_counter()
+    with urllib.request.urlopen(make_request(), timeout=60) as res:
+        res.read()
+    return time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def run_level(make_request, clients, total):
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(lambda _: timed_call(make_request), range(total)))
+        elapsed = time.perf_counter() - start
+    return latencies, total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint per concurrency level")
+    parser.add_argument("--property-id", type=int, default=1)
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+
+    print(f"{'endpoint':>9} | {'clients':>7} | {'p50 ms':>8} | {'p99 ms':>8} | {'mean ms':>8} | {'req/s':>7}")
+    for name, make_request in make_requests(base_url, args.property_id):
+        timed_call(make_request)  # warm up
+        for clients in CONCURRENCY:
+            latencies, throughput = run_level(make_request, clients, args.requests)
+            latencies_ms = [lat * 1000 for lat in latencies]
+            print(
+                f"{name:>9} | {clients:>7} | {percentile(latencies_ms, 50):>8.1f} | "
+                f"{percentile(latencies_ms, 99):>8.1f} | {statistics.mean(latencies_ms):>8.1f} | {throughput:>7.0f}"
+            )
+
+    with urllib.request.urlopen(f"{base_url}/health/db_pool", timeout=10) as res:
+        print(f"pool metrics : {json.loads(res.read())}")
+
+
+if __name__ == "__main__":
+    main()
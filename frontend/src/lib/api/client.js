@@ -29,8 +29,12 @@ export class ApiError extends Error {
  * @param {object|null} [options.body]
  * @param {Record<string,string>} [options.params] - query string params (falsy values skipped)
  * @param {AbortSignal} [options.signal]
+ * @param {boolean} [options.withHeaders] - resolve to { data, headers } instead of the body alone
  */
-export async function apiFetch(path, { method = 'GET', body = null, params = null, signal } = {}) {
+export async function apiFetch(
+	path,
+	{ method = 'GET', body = null, params = null, signal, withHeaders = false } = {}
+) {
 	const url = new URL(BASE_URL.replace(/\/$/, '') + path);
 
 	if (params) {
@@ -70,6 +74,6 @@ export async function apiFetch(path, { method = 'GET', body = null, params = nul
 		});
 	}
 
-	if (res.status === 204) return null;
-	return res.json();
+	const data = res.status === 204 ? null : await res.json();
+	return withHeaders ? { data, headers: res.headers } : data;
 }
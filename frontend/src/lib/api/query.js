@@ -4,10 +4,21 @@ import { apiFetch } from './client.js';
  * POST /query/search
  * @param {object} propertyQuery - matches backend PropertyQuery model
  *   { min_price, max_price, target_price, min_size, max_size, zoning,
- *     structure, occupancy, prefecture, city, district, limit, sort_by, sort_order }
+ *     structure, occupancy, prefecture, city, district, limit, sort_by, sort_order, cursor }
+ * @returns {Promise<{results: object[], nextCursor: string|null}>}
+ *   nextCursor is read from the X-Next-Cursor response header , pass it back as
+ *   propertyQuery.cursor for the next page (null on the last page).
  */
-export function searchProperties(propertyQuery = {}) {
-	return apiFetch('/query/search', { method: 'POST', body: propertyQuery });
+export async function searchProperties(propertyQuery = {}) {
+	const { data, headers } = await apiFetch('/query/search', {
+		method: 'POST',
+		body: propertyQuery,
+		withHeaders: true
+	});
+	return {
+		results: Array.isArray(data) ? data : [],
+		nextCursor: headers.get('X-Next-Cursor')
+	};
 }
 
 /**
@@ -20,5 +20,6 @@ export const defaultFilters = {
 
 export const filters = writable({ ...defaultFilters });
 export const results = writable([]);
+export const nextCursor = writable(null); // X-Next-Cursor of the last page , null when there is none
 export const searchStatus = writable('idle'); // 'idle' | 'loading' | 'ready' | 'error'
 export const searchError = writable(null);
@@ -1,5 +1,3 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from psycopg2.extras import Json
 
 from fastapi.responses import JSONResponse
@@ -8,27 +6,13 @@ from fastapi.encoders import jsonable_encoder
 import os
 from dotenv import load_dotenv
 from utils.logger import get_logger
+from manage_db.pool import PooledDb
 
 agent_log = get_logger("AgentMemory","db_management")
 
 load_dotenv()
 
-class AgentMemory:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-            )
-        self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
-
-    def close_conn(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+class AgentMemory(PooledDb):
 
     def create_thread_table(self):
         extension_query = """
@@ -51,9 +35,9 @@ class AgentMemory:
         ON DELETE CASCADE
         )
         """
-        self.cursor.execute(extension_query)
-        self.cursor.execute(query)
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(extension_query)
+            cur.execute(query)
         agent_log.info("Created agent_thread table")
 
     def create_agent_messages_table(self):
@@ -79,8 +63,8 @@ class AgentMemory:
         ON DELETE CASCADE
         )
         """
-        self.cursor.execute(query)
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(query)
         agent_log.info("Created agent_message table")
 
     def create_indexes(self):
@@ -88,8 +72,8 @@ class AgentMemory:
         CREATE INDEX IF NOT EXISTS idx_agent_message_thread
         ON agent_message(thread_id);
         """
-        self.cursor.execute(thread_id_index)
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(thread_id_index)
 
     def new_thread(self,user_id,title):
         query = """
@@ -97,9 +81,9 @@ class AgentMemory:
         VALUES (%s,%s)
         RETURNING id;
         """
-        self.cursor.execute(query,(user_id,title))
-        self.conn.commit()
-        row = self.cursor.fetchone()
+        with self.cursor() as cur:
+            cur.execute(query,(user_id,title))
+            row = cur.fetchone()
         if row:
             agent_log.info(f"New thread made : {row['id']}")
             return row["id"]
@@ -112,16 +96,16 @@ class AgentMemory:
         VALUES (%s,%s,%s,%s,%s,%s)
         RETURNING id;
         """
-        self.cursor.execute(query, (
-            thread_id,
-            reduced_state.get('user_input'),
-            reduced_state.get('response'),
-            reduced_state.get('intent'),
-            Json(reduced_state.get('extracted_filters')),
-            Json(reduced_state.get('result_ids')),
-        ))
-        self.conn.commit()
-        row = self.cursor.fetchone()
+        with self.cursor() as cur:
+            cur.execute(query, (
+                thread_id,
+                reduced_state.get('user_input'),
+                reduced_state.get('response'),
+                reduced_state.get('intent'),
+                Json(reduced_state.get('extracted_filters')),
+                Json(reduced_state.get('result_ids')),
+            ))
+            row = cur.fetchone()
         if row:
             agent_log.info(f"message stored for : {row['id']}")
             return row["id"]
@@ -135,8 +119,9 @@ class AgentMemory:
         WHERE thread_id = %s
         ORDER BY created_at ASC;
         """
-        self.cursor.execute(query,(thread_id,))
-        rows = self.cursor.fetchall()
+        with self.cursor() as cur:
+            cur.execute(query,(thread_id,))
+            rows = cur.fetchall()
         if rows:
             agent_log.info(f"Got messages for : {thread_id}")
             return rows
@@ -150,8 +135,9 @@ class AgentMemory:
         WHERE user_id = %s
         ORDER BY updated_at DESC;
         """
-        self.cursor.execute(query,(user_id,))
-        rows = self.cursor.fetchall()
+        with self.cursor() as cur:
+            cur.execute(query,(user_id,))
+            rows = cur.fetchall()
         if rows:
             agent_log.info(f"Got threads for user : {user_id}")
             return rows
@@ -162,5 +148,4 @@ if __name__ == "__main__":
     db = AgentMemory()
     results = db.get_threads(os.getenv("TEST_USER_ID"))
     json_data = jsonable_encoder(results)
-    print(JSONResponse(content=json_data).body)
-    db.close_conn()
\ No newline at end of file
+    print(JSONResponse(content=json_data).body)
\ No newline at end of file
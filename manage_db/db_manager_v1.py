@@ -1,40 +1,107 @@
+import csv
+import io
 import json
+import hashlib
 
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import pandas as pd
 
 from dotenv import load_dotenv
 import os
 
 from utils.logger import get_logger
+from manage_db.pool import PooledDb
+from manage_db.history_db_manager import ListingHistory
 
 db_log = get_logger("DB_MANAGER","db_management")
 
 load_dotenv()
+
+# JSONB keys the search filters on , each gets a partial expression index (see create_filter_indexes)
+FILTER_TEXT_KEYS = ["prefecture","city","district","zoning","structure","occupancy"]
+FILTER_NUMERIC_KEYS = ["size"]
+
+# sort key -> indexed expression , mirrors SORT_EXPRESSIONS in manage_db/query.py (without the p. alias)
+SORT_INDEX_EXPRESSIONS = {
+    "price_yen" : "price_yen",
+    "size" : "jsonb_numeric(data,'size')",
+    "year_built" : "jsonb_numeric(data,'year_built')",
+    "last_update" : "last_update",
+}
+
+# Typed columns of the wide listing view (create_wide_view) , keys missing here are not loaded
+WIDE_TEXT_KEYS = [
+    "agent","available_from","building_description","building_name","city","date_updated",
+    "direction_facing","district","features","investment_situation","land_rights","landmarks",
+    "layout","manage_type","manager_style","next_update_schedule","ns_line","ns_mode","ns_name",
+    "occupancy","other_expenses","parking","prefecture","property_description","sell_situation",
+    "structure","transaction_type","type","unit_number","unit_summary","url","zoning"
+]
+WIDE_NUMERIC_KEYS = [
+    "balcony_size","building_area_ratio","construction_completed","floor_area_ratio","gross_yield",
+    "land_area","maintenance_fee","ns_distance_min","potential_annual_rent","repair_reserve_fund",
+    "road_width","size","total_floors","unit_floor","year_built"
+]
+
+# Refresh scheduler (refresh_queue) : checked column , the old fixed interval in hours and the minimum
+# hours between two checks of the same listing , per updater
+REFRESH_KINDS = {
+    "status" : {"checked": "last_update", "interval_h": 24, "min_h": 6},
+    "metadata" : {"checked": "last_metadata_update", "interval_h": 120, "min_h": 24},
+}
+# weights of the priority terms , multiplied by staleness (hours since the check / interval)
+REFRESH_WEIGHTS = {
+    "change" : float(os.getenv("REFRESH_WEIGHT_CHANGE", 2.0)),   # observed content change rate
+    "age" : float(os.getenv("REFRESH_WEIGHT_AGE", 1.0)),         # older listings expire more often
+    "interest" : float(os.getenv("REFRESH_WEIGHT_INTEREST", 1.5)),  # log(1 + agent results showing it)
+}
+REFRESH_AGE_DAYS = 90  # age at which the expiry term saturates
+REFRESH_INTEREST_DAYS = 30  # agent_message window for the interest term
+
+# rows per DataFrame chunk for the streaming loaders (iter_query and friends)
+DEFAULT_CHUNK_SIZE = int(os.getenv("DB_CHUNK_SIZE", 10_000))
+
+_engine = None
+_engine_pid = None
+
+# shared with the async query engine (manage_db/query.py)
+PROPERTY_BY_ID_QUERY = """
+        SELECT p.*,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                'id',i.id,
+                'image_url',i.image_url,
+                'image_order',i.image_order
+                )
+                ORDER BY i.image_order
+            ) FILTER (WHERE i.id IS NOT NULL) , '[]'
+        ) AS images
+        FROM jp_realestate_v1 p
+        LEFT JOIN jp_realestate_image i
+            ON p.id = i.listing_id
+        WHERE p.id = %s
+        GROUP BY p.id ;
+        """
 #jp_realestate_v1
-class DbManagerV1: #todo : remove table_name and add logging.
+def content_hash(price_yen, payload):
+    """
+    Hash of what a listing row stores (price_yen + data) , key order independent .
+    Compared by update_listing so unchanged listings are not rewritten .
+    """
+    content = json.dumps({"price_yen": price_yen, "data": payload}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+class DbManagerV1(PooledDb): #todo : remove table_name and add logging.
     def __init__(self,table_name :str | None , source = str | None):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        super().__init__()
         self.table_name = table_name
         self.source = source
 
-    def close_conn(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
-
     #--db management--
 
     def create_table(self):
@@ -48,10 +115,22 @@ class DbManagerV1: #todo : remove table_name and add logging.
         last_update TIMESTAMPTZ DEFAULT NOW(),
         last_metadata_update TIMESTAMPTZ DEFAULT NOW(),
         price_yen BIGINT,
-        source_listing_id TEXT NOT NULL 
+        source_listing_id TEXT NOT NULL,
+        content_hash TEXT,
+        refresh_count INT NOT NULL DEFAULT 0,
+        change_count INT NOT NULL DEFAULT 0
         )
         """).format(table = sql.Identifier(self.table_name))
 
+        # tables created before content hashing , NULL hashes count as changed on the next refresh
+        # refresh_count / change_count feed the change rate of the refresh scheduler
+        hash_column_query = sql.SQL("""
+        ALTER TABLE {table}
+        ADD COLUMN IF NOT EXISTS content_hash TEXT,
+        ADD COLUMN IF NOT EXISTS refresh_count INT NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS change_count INT NOT NULL DEFAULT 0;
+        """).format(table = sql.Identifier(self.table_name))
+
         index_query = sql.SQL("""
         CREATE UNIQUE INDEX IF NOT EXISTS {index_name}
         ON {table} (source,source_listing_id);
@@ -68,26 +147,138 @@ class DbManagerV1: #todo : remove table_name and add logging.
             index_name = sql.Identifier(f"idx_active_listing_{self.table_name}"),
             table = sql.Identifier(self.table_name))
 
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None) as cur:
 
             cur.execute(query)
+            cur.execute(hash_column_query)
             cur.execute(index_query)
             cur.execute(partial_idx_query)
 
-        self.conn.commit()
         db_log.info(f"Table {self.table_name} has been created.")
+        self.create_wide_view()
+        # price / status / field changes are captured by trigger into {table}_history
+        ListingHistory(self.table_name).create_tables()
+
+    def drop_table(self):
+        # table , wide view and change history (scratch / benchmark tables)
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {table} CASCADE;").format(table = sql.Identifier(self.table_name)))
+        ListingHistory(self.table_name).drop_tables()
+        db_log.critical(f"Dropped {self.table_name}")
+
+    def create_json_functions(self):
+        # Numeric value of a jsonb key , NULL when missing / not a number (a plain ::numeric cast
+        # would abort the whole query on one bad value , and could not be indexed).
+        function_query = r"""
+        CREATE OR REPLACE FUNCTION jsonb_numeric(doc JSONB, key TEXT)
+        RETURNS NUMERIC
+        LANGUAGE SQL IMMUTABLE PARALLEL SAFE
+        AS $$
+            SELECT CASE
+                WHEN (doc ->> key) ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*$' THEN (doc ->> key)::numeric
+            END
+        $$;
+        """
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(function_query)
+
+    def create_filter_indexes(self):
+        """
+        Expression indexes for the JSONB keys used by build_property_query.
+        Partial on status = 'active' like the price index , since every search filters on it.
+        The query builder must emit the exact same expressions :
+            (p.data ->> 'prefecture') = ...   and   jsonb_numeric(p.data,'size') >= ...
+        Built CONCURRENTLY so it can run against the live table , safe to re-run : an INVALID index
+        left by an interrupted build is dropped and rebuilt , ANALYZE runs only when something was built .
+        Part of the migrate step , not of create_table .
+        """
+        self.create_json_functions()
+
+        index_queries = {}
+        for key in FILTER_TEXT_KEYS:
+            index_queries[f"idx_active_{key}_{self.table_name}"] = (sql.SQL("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name}
+            ON {table} ((data ->> {key}))
+            WHERE status = 'active';
+            """).format(
+                index_name = sql.Identifier(f"idx_active_{key}_{self.table_name}"),
+                table = sql.Identifier(self.table_name),
+                key = sql.Literal(key)))
+
+        for key in FILTER_NUMERIC_KEYS:
+            index_queries[f"idx_active_{key}_{self.table_name}"] = (sql.SQL("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name}
+            ON {table} (jsonb_numeric(data,{key}))
+            WHERE status = 'active';
+            """).format(
+                index_name = sql.Identifier(f"idx_active_{key}_{self.table_name}"),
+                table = sql.Identifier(self.table_name),
+                key = sql.Literal(key)))
+
+        # One index per sort key and direction , matching ORDER BY <expr> <dir> NULLS LAST , p.id <dir>
+        for sort_key, expression in SORT_INDEX_EXPRESSIONS.items():
+            for order in ("ASC","DESC"):
+                index_queries[f"idx_sort_{sort_key}_{order.lower()}_{self.table_name}"] = (sql.SQL("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name}
+                ON {table} ({expression} {order} NULLS LAST , id {order})
+                WHERE status = 'active';
+                """).format(
+                    index_name = sql.Identifier(f"idx_sort_{sort_key}_{order.lower()}_{self.table_name}"),
+                    table = sql.Identifier(self.table_name),
+                    expression = sql.SQL(expression),
+                    order = sql.SQL(order)))
+
+        # valid = usable by the planner , an interrupted CONCURRENTLY build leaves the index INVALID
+        state_query = """
+        SELECT c.relname AS name , i.indisvalid AS valid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass;
+        """
+
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        with self.pool.connection() as conn:
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(state_query,(self.table_name,))
+                    state = {name: valid for name, valid in cur.fetchall() if name in index_queries}
+
+                    for name, valid in state.items():
+                        if not valid:
+                            db_log.warning(f"Rebuilding invalid index {name}")
+                            cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {index_name};").format(
+                                index_name = sql.Identifier(name)))
+
+                    built = [name for name in index_queries if not state.get(name)]
+                    for name in built:
+                        cur.execute(index_queries[name])
+                    if built:
+                        cur.execute(sql.SQL("ANALYZE {table};").format(table = sql.Identifier(self.table_name)))
+            finally:
+                conn.autocommit = False
+
+        db_log.info(f"Filter indexes ready on {self.table_name} , built {len(built)}.")
+
+    def migrate(self):
+        """
+        Explicit schema migration : table , wide view , history and the filter / sort indexes .
+        Run once per deploy (python -m manage_db.migrate) , not on every manager setup .
+        """
+        self.create_table()
+        self.create_filter_indexes()
 
     #todo:update last_update if duplicate is found , last_update defaults to scraped_at .
     def insert_data(self,listings): # Stores the data of a page at once
         query = sql.SQL("""
-        INSERT INTO {table} (price_yen,source_listing_id,source,data)
-        VALUES (%s,%s,%s,%s)
+        INSERT INTO {table} (price_yen,source_listing_id,source,data,content_hash)
+        VALUES (%s,%s,%s,%s,%s)
         ON CONFLICT (source,source_listing_id) DO NOTHING
         RETURNING id , source_listing_id ;
         """).format(table = sql.Identifier(self.table_name))
 
         ids = {}
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor() as cur:
             for listing in listings:
                 clean_payload = dict(listing)
                 price_yen = clean_payload.pop('price_yen',None)
@@ -95,47 +286,116 @@ class DbManagerV1: #todo : remove table_name and add logging.
 
                 cur.execute(query,[
                     price_yen,source_listing_id,self.source,
-                    json.dumps(clean_payload,ensure_ascii=False)
+                    json.dumps(clean_payload,ensure_ascii=False),
+                    content_hash(price_yen,clean_payload)
                 ])
                 result = cur.fetchone()
                 if result:
                     ids[result["source_listing_id"]] = result["id"]
-            self.conn.commit()
+        return ids
+
+    def insert_data_bulk(self,listings): # Stores a whole page / backfill batch in one round trip
+        """
+        Bulk version of insert_data. Rows are COPY'd into a session temp table and
+        moved into the listing table with a single INSERT ... SELECT , so the cost
+        no longer grows with one round trip per listing.
+        Returns the same {source_listing_id : id} map as insert_data (new rows only).
+        """
+        if not listings:
+            return {}
+
+        stage_query = """
+        CREATE TEMP TABLE IF NOT EXISTS listing_stage (
+        price_yen BIGINT,
+        source_listing_id TEXT,
+        data JSONB,
+        content_hash TEXT
+        ) ON COMMIT DELETE ROWS;
+        """
+
+        copy_query = """
+        COPY listing_stage (price_yen,source_listing_id,data,content_hash)
+        FROM STDIN WITH (FORMAT csv);
+        """
+
+        insert_query = sql.SQL("""
+        INSERT INTO {table} (price_yen,source_listing_id,source,data,content_hash)
+        SELECT price_yen,source_listing_id,%s,data,content_hash
+        FROM listing_stage
+        ON CONFLICT (source,source_listing_id) DO NOTHING
+        RETURNING id , source_listing_id ;
+        """).format(table = sql.Identifier(self.table_name))
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for listing in listings:
+            clean_payload = dict(listing)
+            price_yen = clean_payload.pop('price_yen',None)
+            source_listing_id = clean_payload.pop('source_listing_id',None)
+            writer.writerow([
+                price_yen,source_listing_id,
+                json.dumps(clean_payload,ensure_ascii=False),
+                content_hash(price_yen,clean_payload)
+            ])
+        buffer.seek(0)
+
+        with self.cursor() as cur:
+            cur.execute(stage_query)
+            cur.copy_expert(copy_query,buffer)
+            cur.execute(insert_query,(self.source,))
+            ids = {row["source_listing_id"]: row["id"] for row in cur.fetchall()}
+
+        db_log.info(f"Bulk inserted {len(ids)} of {len(listings)} rows into {self.table_name}.")
         return ids
 
     def delete_all(self):
         query = sql.SQL("""
         DELETE FROM {table};
         """).format(table = sql.Identifier(self.table_name))
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None) as cur:
             cur.execute(query)
-            self.conn.commit()
         db_log.critical(f"deleted all data form {self.table_name}")
 
     @staticmethod
     def get_db_engine():
+        # one engine (and its connection pool) per process , a forked child builds its own
+        global _engine, _engine_pid
+        if _engine is not None and _engine_pid == os.getpid():
+            return _engine
+
         dbname = os.getenv("DB_NAME")
         user = os.getenv("DB_USER")
         password = os.getenv("DB_PASSWORD")
         host = os.getenv("DB_HOST")
         port = os.getenv("DB_PORT")
 
-        engine = create_engine(f"postgresql://{user}:{password}@{host}:{port}/{dbname}")
+        engine = create_engine(f"postgresql://{user}:{password}@{host}:{port}/{dbname}", pool_pre_ping=True)
         try :
             with engine.connect() as conn:
                 pass
         except Exception as e:
             db_log.exception(f"Connection with engine failed , error : {e}")
 
+        _engine, _engine_pid = engine, os.getpid()
         return engine
 
+    def iter_query(self, query, params = None, chunk_size = DEFAULT_CHUNK_SIZE, dtype = None):
+        """
+        Yields DataFrames of at most chunk_size rows , read through a server side cursor so only
+        one chunk is held in memory . query is plain SQL with :name params .
+        Keep the consumer short , the read transaction stays open until the generator is exhausted / closed ,
+        meant for analytics / export readers , not for loops that await between chunks (see refresh_queue) .
+        """
+        engine = self.get_db_engine()
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as conn:
+            yield from pd.read_sql(text(query), conn, params=params, chunksize=chunk_size, dtype=dtype)
+
     def reset_table(self):
         query = sql.SQL("""
         TRUNCATE TABLE {table} RESTART IDENTITY;
         """).format(table = sql.Identifier(self.table_name))
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None) as cur:
             cur.execute(query)
-            self.conn.commit()
         db_log.critical(f"Reset {self.table_name}")
 
     #--for updating--
@@ -146,8 +406,8 @@ class DbManagerV1: #todo : remove table_name and add logging.
         SET status  = %s
         WHERE id = %s; 
         """).format(table = sql.Identifier(self.table_name))
-        self.cursor.execute(query,(status,listing_id))
-        #
+        with self.cursor() as cur:
+            cur.execute(query,(status,listing_id))
 
     def update_last_update(self,listing_id:int):
         query = sql.SQL("""
@@ -155,93 +415,207 @@ class DbManagerV1: #todo : remove table_name and add logging.
         SET last_update = CURRENT_TIMESTAMP
         WHERE id = %s;
         """).format(table = sql.Identifier(self.table_name))
-        self.cursor.execute(query,(listing_id,))
-        #
+        with self.cursor() as cur:
+            cur.execute(query,(listing_id,))
 
 
-    def update_listing(self,listing_id,listing):
-        _id = None
+    def update_status_bulk(self,outcomes):
+        """
+        outcomes : [(listing_id , status)] , status None only bumps last_update .
+        One set based UPDATE ... FROM (VALUES ...) for a whole updater batch ,
+        instead of update_status + update_last_update per listing .
+        Returns the number of rows updated .
+        """
+        if not outcomes:
+            return 0
 
-        query = """
-        UPDATE jp_realestate_v1
+        query = sql.SQL("""
+        UPDATE {table} AS t
+        SET status = COALESCE(v.status, t.status),
+            last_update = CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS v(id, status)
+        WHERE t.id = v.id;
+        """).format(table = sql.Identifier(self.table_name))
+
+        with self.cursor(cursor_factory=None) as cur:
+            execute_values(cur,query.as_string(cur),outcomes,template="(%s::int, %s::text)",page_size=len(outcomes))
+            updated = cur.rowcount
+
+        db_log.info(f"Updated status of {updated} of {len(outcomes)} listings in {self.table_name}.")
+        return updated
+
+    def mark_checked(self,kind,listing_ids):
+        """
+        Bumps the checked column of kind (see REFRESH_KINDS) without touching the row otherwise ,
+        for checks that failed : the listing drops down refresh_queue until min_h instead of being ranked first again .
+        """
+        if not listing_ids:
+            return 0
+        query = sql.SQL("""
+        UPDATE {table}
+        SET {checked} = CURRENT_TIMESTAMP
+        WHERE id = ANY(%s);
+        """).format(table = sql.Identifier(self.table_name),checked = sql.Identifier(REFRESH_KINDS[kind]["checked"]))
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query,(list(listing_ids),))
+            return cur.rowcount
+
+    def update_listing(self,listing_id,listing):
+        """
+        Writes price_yen / data only when their content hash differs from the stored one ,
+        last_metadata_update is bumped either way so the listing leaves the refresh queue .
+        An unchanged row keeps its data value (no new TOAST copy) and its indexed columns (HOT update) .
+        Returns (id , changed) , (None , False) when the listing does not exist .
+        """
+        query = sql.SQL("""
+        UPDATE {table} AS t
         SET
-            price_yen = COALESCE(%s, price_yen),
-            data = %s,
+            price_yen = CASE WHEN old.content_hash IS DISTINCT FROM %(hash)s
+                             THEN COALESCE(%(price_yen)s, t.price_yen) ELSE t.price_yen END,
+            data = CASE WHEN old.content_hash IS DISTINCT FROM %(hash)s
+                        THEN %(data)s::jsonb ELSE t.data END,
+            content_hash = %(hash)s,
+            refresh_count = t.refresh_count + 1,
+            change_count = t.change_count + (old.content_hash IS DISTINCT FROM %(hash)s)::int,
             last_metadata_update = CURRENT_TIMESTAMP
-        WHERE id = %s
-        RETURNING id;
-        """
+        FROM (SELECT id , content_hash FROM {table} WHERE id = %(id)s) AS old
+        WHERE t.id = old.id
+        RETURNING t.id , old.content_hash IS DISTINCT FROM %(hash)s AS changed;
+        """).format(table = sql.Identifier(self.table_name))
 
         clean_payload = dict(listing)
+        clean_payload.pop("source_listing_id",None)
         price_yen = clean_payload.pop("price_yen",None)
 
-        json_data = json.dumps(clean_payload,ensure_ascii=False)
-
-        self.cursor.execute(query,(price_yen ,json_data ,listing_id))
-        result = self.cursor.fetchone()
-        if result:
-            _id = result["id"]
+        params = {
+            "id": listing_id,
+            "price_yen": price_yen,
+            "data": json.dumps(clean_payload,ensure_ascii=False),
+        }
+
+        with self.cursor() as cur:
+            if price_yen is None:
+                # no scraped price : the row keeps its stored one (COALESCE above) , so that is the price to hash
+                cur.execute(sql.SQL("SELECT price_yen FROM {table} WHERE id = %s FOR UPDATE;").format(
+                    table = sql.Identifier(self.table_name)),(listing_id,))
+                stored = cur.fetchone()
+                price_yen = stored["price_yen"] if stored else None
+            params["hash"] = content_hash(price_yen,clean_payload)
+            cur.execute(query,params)
+            result = cur.fetchone()
+        if not result:
+            db_log.warning(f"No listing {listing_id} to update")
+            return None , False
 
-        db_log.info(f"Updated meta data of : {listing_id}")
-        return _id
+        db_log.info(f"{'Updated' if result['changed'] else 'Unchanged'} meta data of : {listing_id}")
+        return result["id"] , result["changed"]
 
-    def get_active_ids_metadata(self):
-        query = f"""
-        SELECT id,source_listing_id 
-        FROM {self.table_name}
-        WHERE status = 'active'
-        AND last_metadata_update < NOW() - INTERVAL '5 days'
-        ORDER BY last_metadata_update ASC;
+    def get_known_listings(self,source_listing_ids):
+        """
+        One round trip lookup of already stored listings of this source .
+        Returns {source_listing_id : {"id" , "price_yen"}} for the ids that exist .
         """
+        if not source_listing_ids:
+            return {}
 
-        engine = self.get_db_engine()
-        df = pd.read_sql(query,engine)
+        query = sql.SQL("""
+        SELECT source_listing_id , id , price_yen
+        FROM {table}
+        WHERE source = %s
+        AND source_listing_id = ANY(%s);
+        """).format(table = sql.Identifier(self.table_name))
 
-        return df
+        with self.cursor() as cur:
+            cur.execute(query,(self.source,list(source_listing_ids)))
+            rows = cur.fetchall()
 
-    def get_active_ids(self):
-        query = f"""
-        SELECT id,source_listing_id 
-        FROM {self.table_name}
-        WHERE status = 'active'
-        AND last_update < NOW() - INTERVAL '24 hours'
-        ORDER BY last_update ASC;
-        """
-        # todo : think the time though .
+        return {row["source_listing_id"]: {"id": row["id"], "price_yen": row["price_yen"]} for row in rows}
 
-        engine = self.get_db_engine()
-        df = pd.read_sql(query,engine)
+    def agent_message_exists(self):
+        with self.cursor() as cur:
+            cur.execute("SELECT to_regclass('agent_message') IS NOT NULL AS exists;")
+            return cur.fetchone()["exists"]
 
-        return df
+    def refresh_queue(self, kind = "status", budget = 100):
+        """
+        Active listings to refresh , most valuable first , at most budget rows (required , a run never
+        ranks / holds the whole due set) .
+        kind : "status" (last_update) or "metadata" (last_metadata_update) , see REFRESH_KINDS .
+
+        score = staleness * (1 + change * change_rate + age * expiry_age + interest * log(1 + views))
+        staleness   : hours since the last check / the old fixed interval , so nothing starves
+        change_rate : (change_count + 1) / (refresh_count + 2) , content changes seen by update_listing .
+                      Status flips are not counted : an expired listing leaves the queue (status = 'active')
+                      and nothing sets it active again , so an expiry can not raise a later priority ,
+                      the expiry_age term carries the expiry likelihood instead
+        expiry_age  : listing age / REFRESH_AGE_DAYS , capped at 1
+        views       : agent_message rows of the last REFRESH_INTEREST_DAYS whose result_ids hold the listing
+        Listings checked less than min_h hours ago are not due .
+        Returns [{"id" , "source_listing_id"}] , read in one go so no cursor stays open while the
+        updaters drive the browser (run it with asyncio.to_thread from async code) .
+        """
+        if budget is None or budget < 1:
+            raise ValueError(f"refresh_queue needs a positive budget , got {budget!r}")
+        conf = REFRESH_KINDS[kind]
+
+        interest = """
+            SELECT (r->>'id')::int AS id , COUNT(*) AS views
+            FROM agent_message m
+            CROSS JOIN LATERAL jsonb_array_elements(
+                CASE WHEN jsonb_typeof(m.result_ids) = 'array' THEN m.result_ids ELSE '[]'::jsonb END
+            ) AS r
+            WHERE m.created_at > NOW() - %(interest_days)s * INTERVAL '1 day'
+            AND jsonb_typeof(r->'id') = 'number'
+            GROUP BY 1
+        """
+        if not self.agent_message_exists():
+            interest = "SELECT NULL::int AS id , 0 AS views WHERE false"
+
+        query = f"""
+        WITH interest AS ({interest}),
+        scored AS (
+            SELECT t.id , t.source_listing_id ,
+            EXTRACT(EPOCH FROM NOW() - t.{conf["checked"]}) / 3600.0 / %(interval_h)s AS staleness ,
+            (t.change_count + 1.0) / (t.refresh_count + 2.0) AS change_rate ,
+            LEAST(EXTRACT(EPOCH FROM NOW() - t.scraped_at) / 86400.0 / %(age_days)s , 1.0) AS expiry_age ,
+            LN(1 + COALESCE(i.views, 0)) AS interest
+            FROM {self.table_name} t
+            LEFT JOIN interest i ON i.id = t.id
+            WHERE t.status = 'active'
+            AND t.{conf["checked"]} < NOW() - %(min_h)s * INTERVAL '1 hour'
+        )
+        SELECT id , source_listing_id ,
+        staleness * (1 + %(w_change)s * change_rate + %(w_age)s * expiry_age + %(w_interest)s * interest) AS score
+        FROM scored
+        ORDER BY score DESC
+        LIMIT %(budget)s;
+        """
+        params = {
+            "interest_days": REFRESH_INTEREST_DAYS,
+            "interval_h": conf["interval_h"],
+            "min_h": conf["min_h"],
+            "age_days": REFRESH_AGE_DAYS,
+            "w_change": REFRESH_WEIGHTS["change"],
+            "w_age": REFRESH_WEIGHTS["age"],
+            "w_interest": REFRESH_WEIGHTS["interest"],
+            "budget": budget,
+        }
+        with self.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        return [dict(row) for row in rows]
 
     #--Querying--
 
-    def get_by_id(self,id_):
-        query = """
-                SELECT p.*,
-                COALESCE(
-                    json_agg(
-                        json_build_object(
-                        'id',i.id,
-                        'image_url',i.image_url,
-                        'image_order',i.image_order
-                        )
-                        ORDER BY i.image_order
-                    ) FILTER (WHERE i.id IS NOT NULL) , '[]'
-                ) AS images
-                FROM jp_realestate_v1 p
-                LEFT JOIN jp_realestate_image i
-                    ON p.id = i.listing_id
-                WHERE p.id = %s
-                GROUP BY p.id ;
-                """
-        self.cursor.execute(query, (id_,))
-        result = self.cursor.fetchone()
+    def get_by_id(self,id_,conn = None):
+        with self.cursor(conn=conn) as cur:
+            cur.execute(PROPERTY_BY_ID_QUERY, (id_,))
+            result = cur.fetchone()
         return result  # images = list[dict{id , image_url , image_order}] | list[]
 
     #--querying--
 
-    def get_options(self,column_name):
+    def get_options(self,column_name,conn = None):
         query = sql.SQL("""
         SELECT DISTINCT data ->> %s AS value 
         FROM {table}
@@ -249,7 +623,7 @@ class DbManagerV1: #todo : remove table_name and add logging.
         AND data ->> %s != ''
         ORDER BY value 
         """).format(table = sql.Identifier(self.table_name))
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None,conn=conn) as cur:
             cur.execute(query,(column_name,column_name,column_name))
             rows = cur.fetchall()
         return rows
@@ -264,7 +638,7 @@ class DbManagerV1: #todo : remove table_name and add logging.
             col = sql.Identifier(column_name),
             table = sql.Identifier(self.table_name)
         )
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur :
+        with self.cursor() as cur :
             cur.execute(query)
             result = cur.fetchone()
 
@@ -280,7 +654,7 @@ class DbManagerV1: #todo : remove table_name and add logging.
             table=sql.Identifier(self.table_name)
         )
 
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor() as cur:
             cur.execute(query, (key, key))
             result = cur.fetchone()
 
@@ -333,6 +707,79 @@ class DbManagerV1: #todo : remove table_name and add logging.
 
 
 
+    # --wide listing view--
+    # Replaces load_data's jsonb_each_text + pandas pivot : Postgres keeps a typed , one row per
+    # listing copy of the table , refreshed on demand (REFRESH ... CONCURRENTLY keeps it readable).
+
+    @property
+    def wide_view(self):
+        return f"{self.table_name}_wide"
+
+    def create_wide_view(self, rebuild = False):
+        # rebuild = True after changing WIDE_TEXT_KEYS / WIDE_NUMERIC_KEYS
+        self.create_json_functions()
+
+        columns = [
+            sql.SQL("(data ->> {key}) AS {col}").format(key = sql.Literal(key),col = sql.Identifier(key))
+            for key in WIDE_TEXT_KEYS
+        ] + [
+            sql.SQL("jsonb_numeric(data,{key})::double precision AS {col}").format(
+                key = sql.Literal(key),col = sql.Identifier(key))
+            for key in WIDE_NUMERIC_KEYS
+        ]
+
+        drop_query = sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {view};").format(view = sql.Identifier(self.wide_view))
+
+        view_query = sql.SQL("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS
+        SELECT id, source, scraped_at, status, last_update, price_yen, source_listing_id, {columns}
+        FROM {table};
+        """).format(
+            view = sql.Identifier(self.wide_view),
+            columns = sql.SQL(", ").join(columns),
+            table = sql.Identifier(self.table_name))
+
+        # the unique index is what allows REFRESH ... CONCURRENTLY
+        index_query = sql.SQL("""
+        CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {view} (id);
+        """).format(
+            index_name = sql.Identifier(f"idx_id_{self.wide_view}"),
+            view = sql.Identifier(self.wide_view))
+
+        with self.cursor(cursor_factory=None) as cur:
+            if rebuild:
+                cur.execute(drop_query)
+            cur.execute(view_query)
+            cur.execute(index_query)
+
+        db_log.info(f"Materialized view {self.wide_view} ready.")
+
+    def refresh_wide_view(self):
+        query = sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {view};").format(view = sql.Identifier(self.wide_view))
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query)
+        db_log.info(f"Refreshed {self.wide_view}")
+
+    def load_wide_data(self, include_expired = False, refresh = False):
+        """Same frame as load_data (typed columns for the known keys) , read straight from the wide view."""
+        if refresh:
+            self.refresh_wide_view()
+
+        query = f"SELECT * FROM {self.wide_view}"
+        if not include_expired:
+            query += " WHERE status = 'active'"
+
+        return pd.read_sql(query + ";", self.get_db_engine())
+
+    def iter_wide_data(self, include_expired = False, chunk_size = DEFAULT_CHUNK_SIZE):
+        """load_wide_data in chunks , numeric keys are float64 in every chunk (even all-NULL ones)."""
+        query = f"SELECT * FROM {self.wide_view}"
+        if not include_expired:
+            query += " WHERE status = 'active'"
+
+        dtype = {key: "float64" for key in WIDE_NUMERIC_KEYS}
+        yield from self.iter_query(query + " ORDER BY id;", chunk_size=chunk_size, dtype=dtype)
+
     # --one time scripts--
 
     def add_last_metadata_update(self):
@@ -345,10 +792,9 @@ class DbManagerV1: #todo : remove table_name and add logging.
         SET last_metadata_update = scraped_at
         WHERE last_metadata_update IS NULL;
         """
-        with self.conn.cursor() as cur :
+        with self.cursor(cursor_factory=None) as cur :
             cur.execute(query)
             cur.execute(adjustment)
-        self.conn.commit()
 
     def remove_null_price(self):
         query = """
@@ -356,7 +802,8 @@ class DbManagerV1: #todo : remove table_name and add logging.
         WHERE price_yen IS NULL
         RETURNING id;
         """
-        self.cursor.execute(query)
-        results = self.cursor.fetchall()
+        with self.cursor() as cur:
+            cur.execute(query)
+            results = cur.fetchall()
         return [row['id'] for row in results] if results else None
 
@@ -0,0 +1,242 @@
+import os
+import socket
+
+from dotenv import load_dotenv
+
+from utils.logger import get_logger
+from manage_db.pool import PooledDb
+
+frontier_log = get_logger("CrawlFrontier","db_management")
+
+load_dotenv()
+
+# Persistent crawl state : every discovered listing is a crawl_frontier row (pending -> claimed -> done / failed)
+# and crawl_cursor keeps the next results page per crawl , so a restarted run resumes instead of
+# starting from page 1 . Workers claim rows with FOR UPDATE SKIP LOCKED , claims older than
+# stale_after are treated as abandoned (crashed worker) and handed out again until max_attempts .
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class CrawlFrontier(PooledDb):
+    def __init__(self,source,max_attempts = 3,stale_after_min = 15):
+        super().__init__()
+        self.source = source
+        self.max_attempts = max_attempts
+        self.stale_after_min = stale_after_min
+
+    def create_tables(self):
+        frontier_query = """
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+        id BIGSERIAL PRIMARY KEY,
+        source TEXT NOT NULL,
+        source_listing_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        db_id INT,
+        state TEXT NOT NULL DEFAULT 'pending',
+        attempts SMALLINT NOT NULL DEFAULT 0,
+        claimed_by TEXT,
+        claimed_at TIMESTAMPTZ,
+        last_error TEXT,
+        discovered_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        UNIQUE (source, source_listing_id)
+        );
+        """
+
+        # claim scans only what is still to do
+        work_index = """
+        CREATE INDEX IF NOT EXISTS idx_crawl_frontier_work
+        ON crawl_frontier (source, id)
+        WHERE state IN ('pending','claimed');
+        """
+
+        cursor_query = """
+        CREATE TABLE IF NOT EXISTS crawl_cursor (
+        source TEXT NOT NULL,
+        crawl_key TEXT NOT NULL,
+        next_page INT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (source, crawl_key)
+        );
+        """
+
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(frontier_query)
+            cur.execute(work_index)
+            cur.execute(cursor_query)
+
+        frontier_log.info("crawl_frontier and crawl_cursor tables ready")
+
+    # --frontier--
+
+    def add_discovered(self,items):
+        """
+        items : [{"listing_id" , "url" , "db_id"}] , db_id set when a stored listing needs a refresh .
+        New ids become pending , done / failed ids are queued again , pending / claimed ones are left alone .
+        Returns the number of rows queued .
+        """
+        if not items:
+            return 0
+
+        query = """
+        INSERT INTO crawl_frontier (source, source_listing_id, url, db_id)
+        SELECT %s , t.source_listing_id , t.url , t.db_id
+        FROM unnest(%s::text[], %s::text[], %s::int[]) AS t(source_listing_id, url, db_id)
+        ON CONFLICT (source, source_listing_id) DO UPDATE
+        SET state = 'pending',
+            attempts = 0,
+            url = EXCLUDED.url,
+            db_id = EXCLUDED.db_id,
+            last_error = NULL,
+            updated_at = NOW()
+        WHERE crawl_frontier.state IN ('done','failed')
+        RETURNING id;
+        """
+
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query,(
+                self.source,
+                [item["listing_id"] for item in items],
+                [item["url"] for item in items],
+                [item.get("db_id") for item in items],
+            ))
+            queued = len(cur.fetchall())
+
+        frontier_log.info(f"queued {queued} of {len(items)} discovered listings")
+        return queued
+
+    def claim(self,limit,worker = None):
+        """
+        Claims up to limit listings for this worker , safe to call from many workers at once .
+        Returns [{"frontier_id" , "listing_id" , "url" , "db_id" , "attempts"}] .
+        """
+        # stale claims are retried while under max_attempts , the ones already at the cap (a worker died
+        # on them every time) are moved to failed in the same statement instead of being handed out forever
+        query = """
+        WITH expired AS (
+            UPDATE crawl_frontier
+            SET state = 'failed',
+                last_error = COALESCE(last_error, 'claim went stale'),
+                updated_at = NOW()
+            WHERE id IN (
+                SELECT id FROM crawl_frontier
+                WHERE source = %(source)s
+                AND state = 'claimed'
+                AND claimed_at < NOW() - make_interval(mins => %(stale_after)s)
+                AND attempts >= %(max_attempts)s
+                FOR UPDATE SKIP LOCKED
+            )
+        )
+        UPDATE crawl_frontier f
+        SET state = 'claimed',
+            claimed_by = %(worker)s,
+            claimed_at = NOW(),
+            attempts = f.attempts + 1,
+            updated_at = NOW()
+        WHERE f.id IN (
+            SELECT id FROM crawl_frontier
+            WHERE source = %(source)s
+            AND (state = 'pending' OR (
+                state = 'claimed'
+                AND claimed_at < NOW() - make_interval(mins => %(stale_after)s)
+                AND attempts < %(max_attempts)s
+            ))
+            ORDER BY id
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING f.id AS frontier_id , f.source_listing_id AS listing_id , f.url , f.db_id , f.attempts;
+        """
+        params = {
+            "worker": worker or worker_name(),
+            "source": self.source,
+            "stale_after": self.stale_after_min,
+            "max_attempts": self.max_attempts,
+            "limit": limit,
+        }
+        with self.cursor() as cur:
+            cur.execute(query,params)
+            rows = cur.fetchall()
+
+        return [dict(row) for row in rows]
+
+    def mark_done(self,frontier_ids,worker = None):
+        # only rows this worker still holds , a stale claim reclaimed by another worker is theirs now
+        if not frontier_ids:
+            return 0
+        query = """
+        UPDATE crawl_frontier
+        SET state = 'done', last_error = NULL, updated_at = NOW()
+        WHERE id = ANY(%s)
+        AND state = 'claimed'
+        AND claimed_by = %s;
+        """
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query,(list(frontier_ids),worker or worker_name()))
+            updated = cur.rowcount
+        if updated < len(frontier_ids):
+            frontier_log.warning(f"{len(frontier_ids) - updated} of {len(frontier_ids)} done rows were no longer claimed by this worker")
+        return updated
+
+    def mark_failed(self,frontier_id,error = None,worker = None):
+        # back to pending until max_attempts , then failed for good (only while this worker holds the claim)
+        query = """
+        UPDATE crawl_frontier
+        SET state = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+            last_error = %s,
+            updated_at = NOW()
+        WHERE id = %s
+        AND state = 'claimed'
+        AND claimed_by = %s;
+        """
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query,(
+                self.max_attempts,None if error is None else str(error)[:1000],frontier_id,worker or worker_name()
+            ))
+            updated = cur.rowcount
+        if not updated:
+            frontier_log.warning(f"frontier row {frontier_id} is no longer claimed by this worker , failure not recorded")
+        return updated
+
+    def progress(self):
+        query = """
+        SELECT state , COUNT(*) AS n
+        FROM crawl_frontier
+        WHERE source = %s
+        GROUP BY state;
+        """
+        with self.cursor() as cur:
+            cur.execute(query,(self.source,))
+            rows = cur.fetchall()
+
+        counts = {"pending": 0, "claimed": 0, "done": 0, "failed": 0}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    # --page cursor--
+
+    def get_next_page(self,crawl_key):
+        query = """
+        SELECT next_page FROM crawl_cursor
+        WHERE source = %s AND crawl_key = %s;
+        """
+        with self.cursor() as cur:
+            cur.execute(query,(self.source,crawl_key))
+            row = cur.fetchone()
+        return row["next_page"] if row else 1
+
+    def save_next_page(self,crawl_key,next_page):
+        query = """
+        INSERT INTO crawl_cursor (source, crawl_key, next_page)
+        VALUES (%s,%s,%s)
+        ON CONFLICT (source, crawl_key) DO UPDATE
+        SET next_page = EXCLUDED.next_page, updated_at = NOW();
+        """
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query,(self.source,crawl_key,next_page))
+
+    def reset_cursor(self,crawl_key):
+        # crawl finished , the next run starts again from the newest page
+        self.save_next_page(crawl_key,1)
@@ -5,4 +5,3 @@ if __name__ == "__main__":
     db = DbManagerV1("jp_realestate_v1",None)
     df =[row[0] for row in db.get_options("structure")]
     print(df)
-    db.close_conn()
@@ -0,0 +1,173 @@
+from psycopg2 import sql
+
+from utils.logger import get_logger
+from manage_db.pool import PooledDb
+
+history_log = get_logger("ListingHistory","db_management")
+
+# Append-only change log of a listing table : an AFTER UPDATE trigger writes one {table}_history row
+# per write that changed price_yen , status or one of HISTORY_FIELDS , with only the changed values
+# (unchanged price / status are NULL , fields holds {key : [old , new]}) . Rows arrive in time order ,
+# so a BRIN index on changed_at keeps "last N days" scans to the newest blocks at any table size .
+
+# data keys whose changes are kept , the rest of the payload is not tracked
+HISTORY_FIELDS = [
+    "sell_situation","occupancy","transaction_type","maintenance_fee","repair_reserve_fund",
+    "gross_yield","potential_annual_rent","layout","size"
+]
+
+
+class ListingHistory(PooledDb):
+    def __init__(self,listing_table = "jp_realestate_v1"):
+        super().__init__()
+        self.listing_table = listing_table
+        self.history_table = f"{listing_table}_history"
+
+    def create_tables(self):
+        """History table , its indexes and the capture trigger on the listing table , safe to re-run ."""
+        names = {
+            "table": sql.Identifier(self.listing_table),
+            "history": sql.Identifier(self.history_table),
+            "func": sql.Identifier(f"{self.history_table}_capture"),
+            "trigger": sql.Identifier(f"trg_{self.history_table}"),
+        }
+
+        # fixed width columns first , no primary key : nothing references a history row
+        table_query = sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {history} (
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        old_price BIGINT,
+        new_price BIGINT,
+        listing_id INT NOT NULL,
+        old_status TEXT,
+        new_status TEXT,
+        fields JSONB
+        );
+        """).format(**names)
+
+        time_index = sql.SQL("""
+        CREATE INDEX IF NOT EXISTS {index_name}
+        ON {history} USING BRIN (changed_at)
+        WITH (pages_per_range = 32, autosummarize = on);
+        """).format(index_name=sql.Identifier(f"brin_changed_at_{self.history_table}"),**names)
+
+        listing_index = sql.SQL("""
+        CREATE INDEX IF NOT EXISTS {index_name}
+        ON {history} (listing_id, changed_at);
+        """).format(index_name=sql.Identifier(f"idx_listing_{self.history_table}"),**names)
+
+        function_query = sql.SQL("""
+        CREATE OR REPLACE FUNCTION {func}()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            changed_fields JSONB;
+        BEGIN
+            IF OLD.content_hash IS DISTINCT FROM NEW.content_hash THEN
+                SELECT jsonb_object_agg(k, jsonb_build_array(OLD.data -> k, NEW.data -> k))
+                INTO changed_fields
+                FROM unnest({fields}::text[]) AS k
+                WHERE (OLD.data -> k) IS DISTINCT FROM (NEW.data -> k);
+            END IF;
+
+            IF OLD.price_yen IS DISTINCT FROM NEW.price_yen
+            OR OLD.status IS DISTINCT FROM NEW.status
+            OR changed_fields IS NOT NULL THEN
+                INSERT INTO {history} (listing_id, old_price, new_price, old_status, new_status, fields)
+                VALUES (
+                    NEW.id,
+                    CASE WHEN OLD.price_yen IS DISTINCT FROM NEW.price_yen THEN OLD.price_yen END,
+                    CASE WHEN OLD.price_yen IS DISTINCT FROM NEW.price_yen THEN NEW.price_yen END,
+                    CASE WHEN OLD.status IS DISTINCT FROM NEW.status THEN OLD.status END,
+                    CASE WHEN OLD.status IS DISTINCT FROM NEW.status THEN NEW.status END,
+                    changed_fields
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        """).format(fields=sql.Literal(HISTORY_FIELDS),**names)
+
+        # WHEN skips the function call for no-op writes (eg: unchanged content hash , same status)
+        trigger_query = sql.SQL("""
+        DROP TRIGGER IF EXISTS {trigger} ON {table};
+        CREATE TRIGGER {trigger}
+        AFTER UPDATE OF price_yen, status, data, content_hash ON {table}
+        FOR EACH ROW
+        WHEN (OLD.price_yen IS DISTINCT FROM NEW.price_yen
+            OR OLD.status IS DISTINCT FROM NEW.status
+            OR OLD.content_hash IS DISTINCT FROM NEW.content_hash)
+        EXECUTE FUNCTION {func}();
+        """).format(**names)
+
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(table_query)
+            cur.execute(time_index)
+            cur.execute(listing_index)
+            cur.execute(function_query)
+            cur.execute(trigger_query)
+
+        history_log.info(f"{self.history_table} and its capture trigger on {self.listing_table} are ready")
+
+    def drop_tables(self):
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {history};").format(history=sql.Identifier(self.history_table)))
+            cur.execute(sql.SQL("DROP FUNCTION IF EXISTS {func}() CASCADE;").format(
+                func=sql.Identifier(f"{self.history_table}_capture")))
+
+    # --queries--
+
+    def price_drops(self,days = 7,min_drop_pct = 0,limit = 100,active_only = True):
+        """
+        Listings whose price went down over the last days , net of every change in the window
+        (price before the first change vs price after the last one) , biggest drop first .
+        Returns [{"listing_id" , "source_listing_id" , "status" , "price_before" , "price_now" ,
+        "drop_yen" , "drop_pct" , "changes" , "last_change"}] .
+        """
+        query = sql.SQL("""
+        WITH per_listing AS (
+            SELECT listing_id ,
+            (array_agg(old_price ORDER BY changed_at))[1] AS price_before ,
+            (array_agg(new_price ORDER BY changed_at DESC))[1] AS price_now ,
+            COUNT(*) AS changes ,
+            MAX(changed_at) AS last_change
+            FROM {history}
+            WHERE changed_at >= NOW() - make_interval(days => %(days)s)
+            AND new_price IS NOT NULL
+            GROUP BY listing_id
+        )
+        SELECT p.listing_id , l.source_listing_id , l.status ,
+        p.price_before , p.price_now ,
+        p.price_before - p.price_now AS drop_yen ,
+        ROUND(100.0 * (p.price_before - p.price_now) / NULLIF(p.price_before, 0), 2) AS drop_pct ,
+        p.changes , p.last_change
+        FROM per_listing p
+        JOIN {table} l ON l.id = p.listing_id
+        WHERE p.price_now < p.price_before
+        AND 100.0 * (p.price_before - p.price_now) >= %(min_drop_pct)s * p.price_before
+        AND (NOT %(active_only)s OR l.status = 'active')
+        ORDER BY drop_pct DESC , drop_yen DESC
+        LIMIT %(limit)s;
+        """).format(history=sql.Identifier(self.history_table),table=sql.Identifier(self.listing_table))
+
+        params = {"days": int(days), "min_drop_pct": min_drop_pct, "active_only": active_only, "limit": limit}
+        with self.cursor() as cur:
+            cur.execute(query,params)
+            rows = cur.fetchall()
+        return [dict(row) for row in rows]
+
+    def listing_timeline(self,listing_id,limit = 100):
+        """Recorded changes of one listing , newest first ."""
+        query = sql.SQL("""
+        SELECT changed_at , old_price , new_price , old_status , new_status , fields
+        FROM {history}
+        WHERE listing_id = %s
+        ORDER BY changed_at DESC
+        LIMIT %s;
+        """).format(history=sql.Identifier(self.history_table))
+
+        with self.cursor() as cur:
+            cur.execute(query,(listing_id,limit))
+            rows = cur.fetchall()
+        return [dict(row) for row in rows]
@@ -1,32 +1,14 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-
 from dotenv import load_dotenv
-import os
 
 from utils.logger import get_logger
+from manage_db.pool import PooledDb
 
 image_log = get_logger("ImageDb","db_management")
 
 
 load_dotenv()
 
-class ImageDb:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
-
-    def close_conn(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+class ImageDb(PooledDb):
 
     def create_table(self):
         query = """
@@ -52,39 +34,72 @@ class ImageDb:
         ON jp_realestate_image (listing_id, image_order);
         """
 
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None) as cur:
             cur.execute(query)
             cur.execute(unique_index)
 
-        self.conn.commit()
         image_log.info("created jp_realestate_image table")
 
     def insert_ima_url(self,listing_id,urls_pack):
         _id = []
-        for order,url in enumerate(urls_pack):
-            query = """
-            INSERT INTO jp_realestate_image (listing_id,image_order,image_url)
-            VALUES (%s,%s,%s)
-            ON CONFLICT (listing_id, image_order) 
-            DO NOTHING
-            RETURNING id;
-            """
-            self.cursor.execute(query,(listing_id,order,url))
-            row = self.cursor.fetchone()
-            if row:
-                _id.append(row["id"])
-        self.conn.commit()
+        with self.cursor() as cur:
+            for order,url in enumerate(urls_pack):
+                query = """
+                INSERT INTO jp_realestate_image (listing_id,image_order,image_url)
+                VALUES (%s,%s,%s)
+                ON CONFLICT (listing_id, image_order) 
+                DO NOTHING
+                RETURNING id;
+                """
+                cur.execute(query,(listing_id,order,url))
+                row = cur.fetchone()
+                if row:
+                    _id.append(row["id"])
         image_log.info(f"inserted {len(_id)} images for {listing_id}.")
         return _id
 
+    def insert_ima_urls_bulk(self,images_map):
+        """
+        Writes the images of a whole page in one statement.
+        images_map : {listing_id : [urls]} , image_order follows the list order like insert_ima_url.
+        Returns {listing_id : [image ids]} for the newly inserted rows.
+        """
+        listing_ids, orders, urls = [], [], []
+        for listing_id, urls_pack in images_map.items():
+            for order, url in enumerate(urls_pack):
+                listing_ids.append(listing_id)
+                orders.append(order)
+                urls.append(url)
+
+        if not urls:
+            return {}
+
+        query = """
+        INSERT INTO jp_realestate_image (listing_id,image_order,image_url)
+        SELECT * FROM unnest(%s::int[], %s::smallint[], %s::text[])
+        ON CONFLICT (listing_id, image_order)
+        DO NOTHING
+        RETURNING id, listing_id;
+        """
+        with self.cursor() as cur:
+            cur.execute(query,(listing_ids,orders,urls))
+            rows = cur.fetchall()
+
+        _ids = {}
+        for row in rows:
+            _ids.setdefault(row["listing_id"],[]).append(row["id"])
+        image_log.info(f"inserted {len(rows)} images for {len(images_map)} listings.")
+        return _ids
+
     def get_images(self,_id):
         query = """
         SELECT id,image_url,image_order FROM jp_realestate_image
         WHERE listing_id = %s
         Order BY image_order ASC;
         """
-        self.cursor.execute(query,(_id,))
-        return self.cursor.fetchall()
+        with self.cursor() as cur:
+            cur.execute(query,(_id,))
+            return cur.fetchall()
 
     def get_thumbnails(self, _ids):
         if not _ids:
@@ -95,8 +110,9 @@ class ImageDb:
         WHERE image_order = 1 AND listing_id = ANY(%s);
         """
 
-        self.cursor.execute(query, (_ids,))
-        rows = self.cursor.fetchall()
+        with self.cursor() as cur:
+            cur.execute(query, (_ids,))
+            rows = cur.fetchall()
 
         db_results = {row["listing_id"]: row["image_url"] for row in rows}
         ids_map = {_id: db_results.get(_id, None) for _id in _ids}
@@ -116,19 +132,17 @@ class ImageDb:
         ALTER TABLE jp_realestate_image 
         ALTER COLUMN image_order TYPE SMALLINT;
         """
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None) as cur:
             cur.execute(add_query)
             cur.execute(drop_query)
             cur.execute(change_col_query)
 
-        self.conn.commit()
-
     def reset(self):
         query = """
         TRUNCATE TABLE jp_realestate_image RESTART IDENTITY;
         """
-        self.cursor.execute(query)
-        self.conn.commit()
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query)
         image_log.critical("reset jp_realestate_image")
 
     def has_image(self,listing_id) -> bool:
@@ -139,11 +153,12 @@ class ImageDb:
             WHERE listing_id = %s
         );
         """
-        self.cursor.execute(query,(listing_id,))
-        return self.cursor.fetchone()[0]
+        with self.cursor(cursor_factory=None) as cur:
+            cur.execute(query,(listing_id,))
+            return cur.fetchone()[0]
 
     def get_listing_ids_with_images(self) -> set[int]:
-        with self.conn.cursor() as cur:
+        with self.cursor(cursor_factory=None) as cur:
             cur.execute("""
             SELECT DISTINCT listing_id
             FROM jp_realestate_image
@@ -160,11 +175,11 @@ class ImageDb:
             AND i.image_order = 1
         WHERE p.status = 'active' AND p.id = 6186;
         """
-        self.cursor.execute(query)
-        return self.cursor.fetchall()
+        with self.cursor() as cur:
+            cur.execute(query)
+            return cur.fetchall()
 
 if __name__ == "__main__":
     db = ImageDb()
     ima = db.test_query()
-    print(f"results : {ima}")
-    db.close_conn()
\ No newline at end of file
+    print(f"results : {ima}")
\ No newline at end of file
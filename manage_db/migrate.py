@@ -0,0 +1,11 @@
+import sys
+
+from manage_db.db_manager_v1 import DbManagerV1
+
+# Schema migration of a listing table (table , wide view , history , filter / sort indexes) .
+# Safe to re-run : existing objects are kept , invalid indexes are rebuilt .
+# usage : python -m manage_db.migrate [table_name]
+
+if __name__ == "__main__":
+    table_name = sys.argv[1] if len(sys.argv) > 1 else "jp_realestate_v1"
+    DbManagerV1(table_name,None).migrate()
@@ -0,0 +1,319 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import RealDictCursor
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from dotenv import load_dotenv
+
+from utils.logger import get_logger
+
+pool_log = get_logger("DbPool","db_management")
+
+load_dotenv()
+
+# Process-wide psycopg2 connection pool shared by every manage_db manager.
+# Managers borrow a connection per operation , so a manager instance is cheap to
+# build and safe to share between threads .
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _ReusingPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that keeps returned connections for reuse : the stock _putconn closes every
+    connection once minconn are idle , so each concurrent borrow above minconn reconnected .
+    Idle connections stay up to maxconn , the ones above minconn are reaped after max_idle seconds ,
+    and a connection idle longer than check_after is checked with SELECT 1 before it is handed out
+    (a server restart leaves dead connections that still report closed == 0) .
+    """
+    def __init__(self, minconn, maxconn, max_idle, check_after, *args, **kwargs):
+        # set before the base __init__ , it opens the first minconn connections through _connect
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._idle_since = {}  # id(conn) -> monotonic time it went idle
+        self.opened = 0
+        self.discarded = 0
+        self.reaped = 0
+        self.health_failures = 0
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        self.opened += 1
+        if key is None:
+            self._idle_since[id(conn)] = time.monotonic()
+        return conn
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_idle(self):
+        # called with the lock held , the oldest idle connections sit at the front of _pool
+        now = time.monotonic()
+        while len(self._pool) > self.minconn and now - self._idle_since[id(self._pool[0])] > self.max_idle:
+            conn = self._pool.pop(0)
+            del self._idle_since[id(conn)]
+            self.reaped += 1
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, key=None):
+        while True:
+            with self._lock:
+                self._reap_idle()
+                conn = self._getconn(key)
+                now = time.monotonic()
+                idle_for = now - self._idle_since.pop(id(conn), now)
+            # the check runs outside the lock , a hanging dead socket only stalls its own borrower
+            if idle_for < self.check_after or self._is_alive(conn):
+                return conn
+            pool_log.warning("Dropped a dead connection from the pool.")
+            with self._lock:
+                self.health_failures += 1
+            self.putconn(conn, close=True)
+
+    def _putconn(self, conn, key=None, close=False):
+        if self.closed:
+            raise PoolError("connection pool is closed")
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise PoolError("trying to put unkeyed connection")
+
+        keep = not close and not conn.closed and len(self._pool) < self.maxconn
+        if keep:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                keep = False  # server connection lost
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    keep = False
+
+        if keep:
+            self._pool.append(conn)
+            self._idle_since[id(conn)] = time.monotonic()
+        else:
+            self.discarded += 1
+            self._close_quietly(conn)
+
+        del self._used[key]
+        del self._rused[id(conn)]
+
+
+class ConnectionPool:
+    """
+    _ReusingPool plus what psycopg2 lacks : borrowers wait (up to timeout) instead of getting
+    PoolError when max_size connections are out , and a few counters for sizing the pool .
+    """
+    def __init__(self, min_size=1, max_size=10, max_idle=300.0, timeout=30.0, check_after=30.0):
+        """
+        min_size    : connections kept open even when idle .
+        max_size    : hard cap on open connections , borrowers wait past it .
+        max_idle    : seconds an idle connection above min_size lives before being reaped .
+        timeout     : seconds a borrower waits for a free connection before PoolTimeout .
+        check_after : idle seconds after which a connection is health checked on checkout .
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_after = check_after
+
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+        # metrics
+        self._checked_out = 0
+        self._waiting = 0
+        self._requests = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def open(self):
+        """Opens min_size connections , used to warm the pool at startup ."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = _ReusingPool(
+                    self.min_size, self.max_size, self.max_idle, self.check_after,
+                    dbname=os.getenv("DB_NAME"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    host=os.getenv("DB_HOST"),
+                    port=os.getenv("DB_PORT")
+                )
+        return self._pool
+
+    def getconn(self):
+        pool = self._pool or self.open()
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited = time.monotonic() - start
+
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self._timeouts += 1
+        if not acquired:
+            raise PoolTimeout(f"No connection available within {self.timeout}s (max_size={self.max_size}).")
+
+        try:
+            conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._checked_out += 1
+            self._requests += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn):
+        # broken connections are closed instead of going back to the pool (see _ReusingPool._putconn)
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            with self._lock:
+                self._checked_out -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection , commits on success and rolls back on error ."""
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def metrics(self):
+        with self._lock:
+            pool = self._pool
+            idle = len(pool._pool) if pool is not None else 0  # idle list of the psycopg2 pool
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": idle + self._checked_out,
+                "idle": idle,
+                "checked_out": self._checked_out,
+                "waiting": self._waiting,
+                "requests": self._requests,
+                "wait_time_total_ms": round(self._wait_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / self._requests, 3) if self._requests else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "connections_opened": pool.opened if pool is not None else 0,
+                "connections_closed": pool.discarded + pool.reaped + pool.health_failures if pool is not None else 0,
+                "connections_reaped": pool.reaped if pool is not None else 0,
+                "health_check_failures": pool.health_failures if pool is not None else 0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+
+
+def make_async_pool() -> AsyncConnectionPool:
+    """
+    psycopg3 pool for the async endpoints , created closed : open it with
+    `await pool.open()` inside the running event loop (see apis/data_querying lifespan).
+    """
+    conninfo = (
+        f"postgresql://"
+        f"{os.getenv('DB_USER')}:"
+        f"{os.getenv('DB_PASSWORD')}@"
+        f"{os.getenv('DB_HOST')}:"
+        f"{os.getenv('DB_PORT')}/"
+        f"{os.getenv('DB_NAME')}"
+    )
+    return AsyncConnectionPool(
+        conninfo,
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+        max_idle=float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        kwargs={"row_factory": dict_row},
+        open=False,
+    )
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide pool , a forked child gets its own pool ."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                max_idle=float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+                check_after=float(os.getenv("DB_POOL_CHECK_AFTER", 30)),
+            )
+            _pool_pid = os.getpid()
+            pool_log.info(f"Created connection pool (min={_pool.min_size} , max={_pool.max_size})")
+        return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+            pool_log.info(f"Closed connection pool , final metrics : {_pool.metrics()}")
+        _pool = None
+
+
+class PooledDb:
+    """Base for the db managers , every operation borrows a connection from the shared pool ."""
+    def __init__(self):
+        self.pool = get_pool()
+
+    @contextmanager
+    def cursor(self, cursor_factory=RealDictCursor, conn=None):
+        # conn : a connection the caller already borrowed (eg: per-request) , its owner commits it .
+        if conn is not None:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
+            return
+
+        with self.pool.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
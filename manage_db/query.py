@@ -1,10 +1,15 @@
+import base64
+import json
+
 import pandas as pd
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
 from psycopg2 import sql
+from psycopg import sql as async_sql
 
-from manage_db.db_manager_v1 import DbManagerV1
+from manage_db.db_manager_v1 import PROPERTY_BY_ID_QUERY
+from manage_db.pool import get_pool
 from psycopg2.extras import RealDictCursor
 
 def build_db_profile(df:pd.DataFrame):
@@ -33,10 +38,29 @@ def build_db_profile(df:pd.DataFrame):
             }
     return profile
 
+# sort key -> typed expression , backed by the idx_sort_* indexes (DbManagerV1.create_filter_indexes)
+SORT_EXPRESSIONS = {
+    "price_yen" : "p.price_yen",
+    "size" : "jsonb_numeric(p.data,'size')",
+    "year_built" : "jsonb_numeric(p.data,'year_built')",
+    "last_update" : "p.last_update",
+}
+
+# sql type of each sort expression , the cursor value is cast back to it when seeking
+SORT_TYPES = {
+    "price_yen" : "bigint",
+    "size" : "numeric",
+    "year_built" : "numeric",
+    "last_update" : "timestamptz",
+}
+
+# largest page a search may ask for , the look-ahead row makes it MAX_PAGE_SIZE + 1 rows per query
+MAX_PAGE_SIZE = 100
+
 class PropertyQuery(BaseModel):
     min_price: Optional[int] = None
     max_price: Optional[int] = None
-    target_price : Optional[int] = None
+    target_price : Optional[int] = None # closest price first , sort_by / sort_order are then ignored
     min_size: Optional[float] = None
     max_size: Optional[float] = None
     zoning: Optional[str] = None
@@ -45,24 +69,85 @@ class PropertyQuery(BaseModel):
     prefecture : Optional[str] = None
     city : Optional[str] = None
     district : Optional[str] = None
-    limit: int = 20
+    limit: int = Field(20, ge=1, le=MAX_PAGE_SIZE) # paginate needs at least one row to cut a cursor from
     sort_by: str = "price_yen"
     sort_order: str = "asc"
+    cursor : Optional[str] = None # opaque next_cursor of the previous page
+
+# --keyset pagination--
+# Pages seek on (sort key , p.id) instead of OFFSET , so page N costs the same as page 1 .
+# The sort key is NULLS LAST : a page first walks the non-null keys with a row comparison
+# (index range scan on idx_sort_*) , then the NULL tail ordered by id .
+
+def page_order(q:PropertyQuery):
+    """
+    (sort expression , sql type , direction) of the query , p.id in the same direction breaks ties .
+    With target_price set the page is ordered by distance to it only : sort_by / sort_order are ignored
+    and equally close listings come in id order (a second key would break the single row-comparison seek) .
+    """
+    if q.target_price is not None:
+        return "ABS(p.price_yen - %(target_price)s)", "bigint", "ASC"
+    sort_by = q.sort_by if q.sort_by in SORT_EXPRESSIONS else "last_update"
+    order = "ASC" if q.sort_order == "asc" else "DESC"
+    return SORT_EXPRESSIONS[sort_by], SORT_TYPES[sort_by], order
+
+def _cursor_scope(q:PropertyQuery):
+    # a cursor is only valid for the ordering it was made with
+    return [q.sort_by,q.sort_order,q.target_price]
+
+def encode_cursor(q:PropertyQuery,sort_value,listing_id):
+    # Decimal / datetime keys travel as their exact text form , build_property_query casts them back
+    payload = {"scope":_cursor_scope(q),"value":sort_value,"id":listing_id}
+    return base64.urlsafe_b64encode(json.dumps(payload,default=str).encode()).decode()
+
+def decode_cursor(q:PropertyQuery):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(q.cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if payload.get("scope") != _cursor_scope(q):
+        raise ValueError("Cursor does not match the sort of this query.")
+    return payload
+
+def paginate(q:PropertyQuery,rows):
+    """Trims the extra look-ahead row and returns (rows , next_cursor | None)."""
+    next_cursor = None
+    if len(rows) > q.limit:
+        rows = rows[:q.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(q,last["_sort_key"],last["id"])
+    for row in rows:
+        row.pop("_sort_key",None)
+    return rows,next_cursor
+
+def needs_null_tail(q:PropertyQuery,rows):
+    # the seek skipped the NULL tail , read it once the non-null keys run out
+    if not q.cursor or len(rows) > q.limit:
+        return False
+    return decode_cursor(q)["value"] is not None
+
+def build_property_query(q : PropertyQuery,table_name : str ,sql = sql ,null_tail = False):
+    """
+    sql : psycopg2.sql by default , the async engine passes psycopg.sql (same composable api).
+    null_tail : only read the rows whose sort key is NULL (second leg of a page , see needs_null_tail).
+    Fetches limit + 1 rows , paginate() uses the extra row to know whether a next page exists.
+    """
+    sort_expression,sort_type,order = page_order(q)
+    sort_expression = sql.SQL(sort_expression)
 
-def build_property_query(q : PropertyQuery,table_name : str ):
     query  = sql.SQL("""
     SELECT
     p.*,
-    i.image_url AS thumbnail_src 
+    i.image_url AS thumbnail_src ,
+    {sort_expression} AS _sort_key
     FROM {table} p 
     LEFT JOIN jp_realestate_image i
         ON p.id = i.listing_id
         AND i.image_order = 1
     WHERE p.status = 'active'
-    """).format(table = sql.Identifier(table_name))
+    """).format(table = sql.Identifier(table_name),sort_expression = sort_expression)
 
     params = {}
-    order_clauses = []
 
     if q.min_price is not None:
         query += sql.SQL(" AND p.price_yen >= %(min_price)s")
@@ -73,17 +158,14 @@ def build_property_query(q : PropertyQuery,table_name : str ):
         params["max_price"] = q.max_price
 
     if q.target_price is not None:
-        order_clauses.append(
-            sql.SQL("ABS(p.price_yen - %(target_price)s)")
-        )
         params["target_price"] = q.target_price
 
     if q.min_size is not None:
-        query += sql.SQL(" AND NULLIF(p.data ->> 'size','')::numeric >= %(min_size)s")
+        query += sql.SQL(" AND jsonb_numeric(p.data,'size') >= %(min_size)s::numeric")
         params["min_size"] = q.min_size
 
     if q.max_size is not None:
-        query += sql.SQL(" AND NULLIF(p.data ->> 'size','')::numeric <= %(max_size)s")
+        query += sql.SQL(" AND jsonb_numeric(p.data,'size') <= %(max_size)s::numeric")
         params["max_size"] = q.max_size
 
     if q.prefecture is not None:
@@ -110,52 +192,104 @@ def build_property_query(q : PropertyQuery,table_name : str ):
         query += sql.SQL(" AND (p.data ->> 'occupancy') = %(occupancy)s")
         params["occupancy"] = q.occupancy
 
-    allowed_sorts = { #todo:map and use sql to apply null protection
-        "price_yen",
-        "size",
-        "year_built",
-        "last_update"
-    }
-
-    sort_by = q.sort_by if q.sort_by in allowed_sorts else "last_update"
-    order = "ASC" if q.sort_order == "asc" else "DESC"
-
-    order_clauses.append(
-        sql.SQL("p.{} {}").format(
-        sql.Identifier(sort_by),
+    seek = decode_cursor(q) if q.cursor else None
+    seek_op = sql.SQL(">" if order == "ASC" else "<")
+
+    if null_tail or (seek and seek["value"] is None):
+        query += sql.SQL(" AND {} IS NULL").format(sort_expression)
+        if seek and seek["value"] is None:
+            query += sql.SQL(" AND p.id {} %(cursor_id)s").format(seek_op)
+            params["cursor_id"] = seek["id"]
+    elif seek:
+        query += sql.SQL(" AND ({}, p.id) {} (%(cursor_value)s::{}, %(cursor_id)s)").format(
+            sort_expression,seek_op,sql.SQL(sort_type))
+        params["cursor_value"] = seek["value"]
+        params["cursor_id"] = seek["id"]
+
+    # NULLS LAST keeps listings missing the key at the end in both directions ,
+    # p.id makes the order total so the seek never skips or repeats a row.
+    query += sql.SQL(" ORDER BY {} {} NULLS LAST , p.id {}").format(
+        sort_expression,
+        sql.SQL(order),
         sql.SQL(order)
     )
-    )
-
-    query += sql.SQL(" ORDER BY ")
-    query += sql.SQL(",").join(order_clauses)
     query += sql.SQL(" LIMIT %(limit)s")
 
-    params["limit"] = q.limit
+    params["limit"] = q.limit + 1
 
     return query,params
 
-def query_property(q:PropertyQuery,table_name:str , conn):
-
-    query,params  = build_property_query(q , table_name)
+def _fetch_rows(conn,q:PropertyQuery,table_name:str,null_tail = False):
+    query,params  = build_property_query(q , table_name ,null_tail=null_tail)
     with conn.cursor(cursor_factory=RealDictCursor) as cur :
         cur.execute(query,params)
-        data = cur.fetchall()
+        return cur.fetchall()
+
+def query_property_page(q:PropertyQuery,table_name:str , conn = None):
+    """Returns (rows , next_cursor) , next_cursor is None on the last page."""
+    # conn = None borrows a connection from the shared pool for this query.
+    if conn is None:
+        with get_pool().connection() as pooled_conn:
+            return query_property_page(q,table_name,pooled_conn)
 
+    rows = _fetch_rows(conn,q,table_name)
+    if needs_null_tail(q,rows):
+        tail_q = q.model_copy(update={"limit": q.limit - len(rows)})
+        rows += _fetch_rows(conn,tail_q,table_name,null_tail=True)
+
+    return paginate(q,rows)
+
+def query_property(q:PropertyQuery,table_name:str , conn = None):
+    data,_ = query_property_page(q,table_name,conn)
     return data
 
+# --async engine (psycopg3)--
+
+async def query_property_async(q:PropertyQuery,table_name:str,pool):
+    """
+    pool : psycopg_pool.AsyncConnectionPool with dict_row (manage_db.pool.make_async_pool).
+    Returns (rows , next_cursor) like query_property_page.
+    """
+    async with pool.connection() as conn:
+        query,params = build_property_query(q,table_name,sql=async_sql)
+        cur = await conn.execute(query,params)
+        rows = await cur.fetchall()
+
+        if needs_null_tail(q,rows):
+            tail_q = q.model_copy(update={"limit": q.limit - len(rows)})
+            query,params = build_property_query(tail_q,table_name,sql=async_sql,null_tail=True)
+            cur = await conn.execute(query,params)
+            rows += await cur.fetchall()
+
+    return paginate(q,rows)
+
+async def get_property_async(property_id:int,pool):
+    async with pool.connection() as conn:
+        cur = await conn.execute(PROPERTY_BY_ID_QUERY,(property_id,))
+        return await cur.fetchone()
+
+async def get_options_async(column_name:str,table_name:str,pool):
+    # async DbManagerV1.get_options , distinct non empty values of a jsonb key
+    query = async_sql.SQL("""
+    SELECT DISTINCT data ->> %s AS value
+    FROM {table}
+    WHERE data ->> %s IS NOT NULL
+    AND data ->> %s != ''
+    ORDER BY value
+    """).format(table = async_sql.Identifier(table_name))
+    async with pool.connection() as conn:
+        cur = await conn.execute(query,(column_name,column_name,column_name))
+        rows = await cur.fetchall()
+    return [row["value"] for row in rows]
 
 
 if __name__ == "__main__":
-    db = DbManagerV1(table_name="jp_realestate_v1")
-    conn = db.conn
-
     q = PropertyQuery(
         max_price=400_000_000,
         min_size=80,
         zoning="Residential"
     )
 
-    results = query_property(q,"jp_realestate_v1",conn)
+    results = query_property(q,"jp_realestate_v1")
 
     print(results)
@@ -1,29 +1,10 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2 import sql
-
 from dotenv import load_dotenv
-import os
-
-load_dotenv()
 
-class UserDbManager:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+from manage_db.pool import PooledDb
 
+load_dotenv()
 
-    def close_conn(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+class UserDbManager(PooledDb):
 
     def create_table_user(self):
 
@@ -38,8 +19,8 @@ class UserDbManager:
     );
         """
 
-        self.cursor.execute(query)
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(query)
 
     def create_table_user_pref(self):
         pass
@@ -52,9 +33,9 @@ class UserDbManager:
         DO UPDATE SET email = EXCLUDED.email
         RETURNING id;
         """
-        self.cursor.execute(query,(email,google_sub))
-        user_id = self.cursor.fetchone()["id"]
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(query,(email,google_sub))
+            user_id = cur.fetchone()["id"]
         if user_id:
             return user_id
         return None
@@ -1,5 +1,4 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor,Json
+from psycopg2.extras import Json
 
 from dotenv import load_dotenv
 import os
@@ -7,6 +6,8 @@ import os
 from pydantic import BaseModel
 from typing import Optional,Dict,Any
 
+from manage_db.pool import PooledDb
+
 class Preference(BaseModel):
     user_id : str
 
@@ -51,22 +52,7 @@ class Preference(BaseModel):
     custom_pref : Optional[Dict[str,Any]] = None
 
 load_dotenv()
-class UserPreference:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
-
-    def close_conn(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+class UserPreference(PooledDb):
 
     def create_table(self):
         query = """
@@ -126,8 +112,8 @@ class UserPreference:
         );
         """
 
-        self.cursor.execute(query)
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(query)
         print("table created")
 
     def insert_pref(self,pref: Preference):
@@ -146,9 +132,9 @@ class UserPreference:
         VALUES ({placeholders})
         RETURNING id
         """
-        self.cursor.execute(query,values)
-        _id = self.cursor.fetchone()["id"]
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(query,values)
+            _id = cur.fetchone()["id"]
         if _id:
             return _id
         return None
@@ -181,13 +167,13 @@ class UserPreference:
         RETURNING id
         """
 
-        self.cursor.execute(query, values)
-        if self.cursor.rowcount == 0:
-            raise ValueError(
-                f"No preference found for user {user_id}"
-            )
-        _id = self.cursor.fetchone()["id"]
-        self.conn.commit()
+        with self.cursor() as cur:
+            cur.execute(query, values)
+            if cur.rowcount == 0:
+                raise ValueError(
+                    f"No preference found for user {user_id}"
+                )
+            _id = cur.fetchone()["id"]
         if _id :
             return _id
         return None
@@ -197,12 +183,12 @@ class UserPreference:
         SELECT * FROM user_preference 
         WHERE user_id = %s 
         """
-        self.cursor.execute(query,(user_id,))
-        prefs = self.cursor.fetchone()
+        with self.cursor() as cur:
+            cur.execute(query,(user_id,))
+            prefs = cur.fetchone()
         return prefs
 
 if __name__ == "__main__":
     db = UserPreference()
     results = db.get_pref(os.getenv("TEST_USER_ID"))
-    print(f"result : {results}")
-    db.close_conn()
\ No newline at end of file
+    print(f"result : {results}")
\ No newline at end of file
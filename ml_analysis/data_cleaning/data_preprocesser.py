@@ -152,7 +152,7 @@ class DataPreprocess:
 
 if __name__ == "__main__":
     db = DbManagerV1("jp_realestate_v1")
-    df1 = db.load_data(include_expired=True)
+    df1 = db.load_wide_data(include_expired=True)
     cleaner = DataPreprocess()
     df1 = cleaner.run_preprocessor(df1)
     print(df1.info())
@@ -3,16 +3,25 @@ from ml_analysis.data_cleaning.data_preprocesser import DataPreprocess
 from sklearn.model_selection import train_test_split
 from sklearn import metrics
 import numpy as np
+import pandas as pd
 
 from catboost import CatBoostRegressor
 
 from pathlib import Path
 
-def load_clean_df():
+def load_clean_df(chunk_size = 10_000):
+    # preprocessing is row-wise , so the raw frame is cleaned chunk by chunk and never held whole .
+    # The cleaned chunks are concatenated on purpose : acc_test's train_test_split has to see the whole
+    # frame to reproduce the split the model was trained on . Peak memory is the cleaned frame (the dropped
+    # text / description columns never accumulate) + one raw chunk_size chunk , not the raw table .
     db = DbManagerV1("jp_realestate_v1")
     cleaner = DataPreprocess()
-    df = db.load_data(include_expired=True)
-    clean_df = cleaner.run_preprocessor(df)
+    db.refresh_wide_view()
+    chunks = [
+        cleaner.run_preprocessor(df)
+        for df in db.iter_wide_data(include_expired=True,chunk_size=chunk_size)
+    ]
+    clean_df = pd.concat(chunks,ignore_index=True)
     return clean_df
 
 def load_model():
@@ -1,12 +1,15 @@
 from playwright.async_api import async_playwright
 import asyncio
 from pathlib import Path
-import json
 import pandas as pd
 import os
 
 from manage_db.db_manager_v1 import DbManagerV1
 from manage_db.image_db_manager import ImageDb
+from scraper.core.resource_policy import ResourcePolicy
+from scraper.core.rate_limiter import make_limiter
+from scraper.core.page_pool import PagePool
+from scraper.core.raw_archive import RawArchive
 
 from utils.logger import get_logger
 
@@ -15,15 +18,25 @@ scr_log = get_logger("ScraperCore","scraper")
 # the base script for scrapers.
 
 class BaseScraper:
-    def __init__(self,table_name:str | None,source:str | None):
+    def __init__(self,table_name:str | None,source:str | None,resource_policy:ResourcePolicy | None = None,block_resources:bool = True):
         self.root_path = Path(__file__).parents[2].resolve()
         self.playwright = None
         self.browser = None
         self.context = None
         self.main_page = None
+        self.pages = None
+
+        # images / fonts / media / trackers are aborted by default , block_resources = False loads everything
+        if resource_policy is None and block_resources:
+            resource_policy = ResourcePolicy()
+        self.resource_policy = resource_policy
+
+        # adaptive per-domain concurrency , wrap every page load in `async with self.limiter.slot(url)`
+        self.limiter = make_limiter(type(self).__name__)
 
         self.listing_db = DbManagerV1(table_name,source)
         self.image_db = ImageDb()
+        self.archives = {}  # file_name -> RawArchive , see store_json
 
     async def start_browser(self):
         self.playwright = await async_playwright().start()
@@ -46,9 +59,23 @@ class BaseScraper:
             has_touch=False,
             ignore_https_errors=True
         )
+        if self.resource_policy:
+            await self.resource_policy.apply(self.context)
         self.main_page = await self.context.new_page()
 
+        # listing tabs are reused , sized for the highest concurrency the limiter may allow
+        self.pages = PagePool(self.context, max_size=max([self.limiter.max_limit, *self.limiter.ceilings.values()]))
+        await self.pages.warm(self.limiter.initial)
+
     async def close_browser(self):
+        self.close_archives()
+        scr_log.info(f"Concurrency limiter : {self.limiter.metrics()}")
+        if self.pages:
+            scr_log.info(f"Page pool : {self.pages.metrics()}")
+            await self.pages.close()
+            self.pages = None
+        if self.resource_policy:
+            scr_log.info(f"Resource policy : {self.resource_policy.metrics()}")
         if self.browser:
             await self.browser.close()
         if self.playwright:
@@ -81,56 +108,58 @@ class BaseScraper:
             df.to_csv(output_file, index=False)
             scr_log.info(f"Overwriting to CSV: {output_file}")
 
-    def clear_json(self, file_name):
-        data_dir = self.root_path / "data" / "raw"
-        output_file = data_dir / f"{file_name}.json"
-
-        if output_file.exists():
-            output_file.write_text(
-                json.dumps([], indent=2),
-                encoding="utf-8-sig"
-            )
-            scr_log.info(f"cleared :  {output_file}")
-        else:
-            scr_log.warning(f"File not found to clear: {output_file}")
+    def open_archive(self, file_name, run_id = None):
+        # new run file under data/raw/<file_name>/ , older runs stay until RAW_ARCHIVE_KEEP_RUNS
+        # run_id : shared by the worker processes of one run , None starts a new run
+        archive = self.archives.get(file_name)
+        if archive is None:
+            archive = self.archives[file_name] = RawArchive(self.root_path / "data" / "raw", file_name)
+        return archive.rotate(run_id)
 
     def store_json(self, data, file_name):
-        data_dir = self.root_path / "data" / "raw"
-        data_dir.mkdir(exist_ok=True)
-
-        output_file = data_dir / f"{file_name}.json"
-
-        if output_file.exists():
-            try:
-                text = output_file.read_text(encoding="utf-8-sig").strip()
-
-                if text:
-                    old = json.loads(text)
-                else:
-                    old = []
-
-                if isinstance(old, list) and isinstance(data, list):
-                    new = old + data
-                else:
-                    new = data
-
-            except Exception as e:
-                scr_log.exception(f"error in storing json : {e}")
-                new = data
-        else:
-            new = data
-
-        output_file.write_text(
-            json.dumps(new, indent=2, ensure_ascii=False),
-            encoding="utf-8-sig"
-        )
+        # append only : one json line per listing , nothing already written is read back
+        archive = self.archives.get(file_name)
+        if archive is None:
+            self.open_archive(file_name)
+            archive = self.archives[file_name]
+        try:
+            archive.append(data)
+        except Exception as e:
+            scr_log.exception(f"error in storing json : {e}")
+
+    def close_archives(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives.clear()
 
     async def store_db_v1(self , dic_list):
-        ids = await asyncio.to_thread(self.listing_db.insert_data,dic_list)
+        ids = await asyncio.to_thread(self.listing_db.insert_data_bulk,dic_list)
         scr_log.info(f"Inserted {len(ids)} new rows , skipped {len(dic_list) - len(ids)} duplicates.")
         return ids
 
+    async def refresh_db_v1(self , updates):
+        # updates : [(db id , listing)] of already stored listings , rows whose content hash matches are not rewritten
+        def run():
+            ids , skipped = [] , 0
+            for listing_id, listing in updates:
+                payload = {k: v for k, v in listing.items() if k != "source_listing_id"}
+                _id , changed = self.listing_db.update_listing(listing_id,payload)
+                if changed:
+                    ids.append(_id)
+                elif _id is not None:
+                    skipped += 1
+            return ids , skipped
+
+        ids , skipped = await asyncio.to_thread(run)
+        scr_log.info(f"Refreshed {len(ids)} changed listings , skipped {skipped} unchanged.")
+        return ids
+
     async def store_image(self,listing_id,urls):
         ids = await asyncio.to_thread(self.image_db.insert_ima_url,listing_id,urls)
         scr_log.info(f"Inserted {len(ids)} new rows into image db .")
         return ids
+
+    async def store_images(self,images_map):
+        ids = await asyncio.to_thread(self.image_db.insert_ima_urls_bulk,images_map)
+        scr_log.info(f"Inserted {sum(len(v) for v in ids.values())} new rows into image db for {len(ids)} listings .")
+        return ids
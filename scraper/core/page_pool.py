@@ -0,0 +1,143 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from utils.logger import get_logger
+
+scr_log = get_logger("PagePool","scraper")
+
+# Reusable tabs of one browser context : pages are created lazily up to max_size , handed out with
+# `async with pool.page() as page` and reset to about:blank on return . Crashed / closed pages
+# (or ones that fail to reset) are dropped and replaced by a fresh page on the next checkout .
+
+RESET_URL = "about:blank"
+
+
+class PagePool:
+    def __init__(self, context, max_size=10, reset_timeout=5000):
+        self.context = context
+        self.max_size = max_size
+        self.reset_timeout = reset_timeout
+
+        self._idle = []
+        self._crashed = set()
+        self._size = 0
+        self._cond = asyncio.Condition()
+        self._closed = False
+
+        # metrics
+        self.created = 0
+        self.reused = 0
+        self.replaced = 0
+
+    async def _new_page(self):
+        page = await self.context.new_page()
+        page.on("crash", lambda: self._crashed.add(page))
+        self.created += 1
+        return page
+
+    def _healthy(self, page):
+        return page not in self._crashed and not page.is_closed()
+
+    async def _discard(self, page):
+        self._crashed.discard(page)
+        self.replaced += 1
+        try:
+            if not page.is_closed():
+                await page.close()
+        except Exception:
+            pass
+
+    async def warm(self, size):
+        """Opens pages up front so the first listings do not pay for tab creation ."""
+        size = min(size, self.max_size)
+        async with self._cond:
+            missing = max(0, size - self._size)
+            self._size += missing
+        for _ in range(missing):
+            page = await self._new_page()
+            async with self._cond:
+                self._idle.append(page)
+                self._cond.notify()
+
+    async def acquire(self):
+        while True:
+            async with self._cond:
+                if self._closed:
+                    raise RuntimeError("Page pool is closed.")
+                while not self._idle and self._size >= self.max_size:
+                    await self._cond.wait()
+
+                if self._idle:
+                    page = self._idle.pop()
+                    if self._healthy(page):
+                        self.reused += 1
+                        return page
+                    # dead while idle , free its slot and look again
+                    self._size -= 1
+                    stale = page
+                else:
+                    self._size += 1
+                    stale = None
+
+            if stale is not None:
+                scr_log.warning("Replacing a crashed / closed page.")
+                await self._discard(stale)
+                continue
+
+            try:
+                return await self._new_page()
+            except Exception:
+                async with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+    async def release(self, page):
+        keep = self._healthy(page) and not self._closed
+        if keep:
+            try:
+                await page.goto(RESET_URL, timeout=self.reset_timeout)
+            except Exception:
+                keep = False
+
+        if not keep:
+            if not self._closed:
+                scr_log.warning("Dropped a page that crashed or failed to reset.")
+            await self._discard(page)
+
+        async with self._cond:
+            if keep:
+                self._idle.append(page)
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.acquire()
+        try:
+            yield page
+        finally:
+            await self.release(page)
+
+    def metrics(self):
+        return {
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": len(self._idle),
+            "created": self.created,
+            "reused": self.reused,
+            "replaced": self.replaced,
+        }
+
+    async def close(self):
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for page in idle:
+            try:
+                await page.close()
+            except Exception:
+                pass
@@ -0,0 +1,187 @@
+import os
+import time
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from utils.logger import get_logger
+
+lim_log = get_logger("AdaptiveLimiter","scraper")
+
+# AIMD concurrency limit per domain , replaces the hardcoded asyncio.Semaphore(5) .
+# + 1 slot after a full window of healthy requests , x decrease_factor on timeouts / 429 / 5xx
+# or when the smoothed latency goes above target_latency . The limit never leaves [min_limit , ceiling] .
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_timeout(e):
+    # asyncio / builtin timeouts , playwright TimeoutError , httpx TimeoutException ...
+    return isinstance(e, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(e).__name__
+
+
+class Slot:
+    def __init__(self):
+        self.status = None  # set by the caller once the response is in (eg: response.status)
+        self.error = None   # set by callers that swallow their exceptions
+
+
+class DomainLimiter:
+    def __init__(self, domain, initial, min_limit, max_limit, target_latency, decrease_factor, cooldown):
+        self.domain = domain
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self._cond = asyncio.Condition()
+        self._in_flight = 0
+        self._window = 0
+        self._last_decrease = 0.0
+
+        # metrics
+        self.latency_ewma = None
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+    async def acquire(self):
+        async with self._cond:
+            while self._in_flight >= int(self.limit):
+                await self._cond.wait()
+            self._in_flight += 1
+
+    async def release(self, latency, throttled=False, error=False):
+        async with self._cond:
+            self._in_flight -= 1
+            self.requests += 1
+            self.errors += int(error)
+            self.throttled += int(throttled)
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+            if throttled or self.latency_ewma > self.target_latency:
+                self._decrease("throttled" if throttled else f"latency {self.latency_ewma:.2f}s")
+            elif not error:
+                self._window += 1
+                if self._window >= int(self.limit):
+                    self._increase()
+
+            self._cond.notify_all()
+
+    def _increase(self):
+        self._window = 0
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+            lim_log.info(f"{self.domain} limit -> {int(self.limit)} (latency {self.latency_ewma:.2f}s)")
+
+    def _decrease(self, reason):
+        self._window = 0
+        now = time.monotonic()
+        # one decrease per cooldown , requests already in flight report the same congestion
+        if now - self._last_decrease < self.cooldown or self.limit <= self.min_limit:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        lim_log.warning(f"{self.domain} limit -> {int(self.limit)} ({reason})")
+
+    def metrics(self):
+        return {
+            "limit": int(self.limit),
+            "ceiling": self.max_limit,
+            "in_flight": self._in_flight,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+        }
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=5, min_limit=1, max_limit=10, ceilings=None,
+                 target_latency=8.0, decrease_factor=0.5, cooldown=5.0):
+        """
+        initial         : starting limit of a domain (the old fixed semaphore size) .
+        max_limit       : default ceiling , ceilings overrides it per domain ({"realestate.co.jp": 8}) .
+        target_latency  : seconds , a smoothed latency above it counts as congestion .
+        decrease_factor : multiplier applied to the limit on congestion .
+        cooldown        : seconds between two decreases of the same domain .
+        """
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.ceilings = ceilings or {}
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.name = "scraper"
+        self._domains = {}
+
+    def domain(self, url_or_domain):
+        domain = urlsplit(url_or_domain).hostname or url_or_domain
+        if domain not in self._domains:
+            self._domains[domain] = DomainLimiter(
+                domain,
+                initial=self.initial,
+                min_limit=self.min_limit,
+                max_limit=self.ceilings.get(domain, self.max_limit),
+                target_latency=self.target_latency,
+                decrease_factor=self.decrease_factor,
+                cooldown=self.cooldown,
+            )
+        return self._domains[domain]
+
+    def ceiling(self, url_or_domain):
+        return self.domain(url_or_domain).max_limit
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """Holds one concurrency slot of the url's domain , latency and outcome feed the limit ."""
+        limiter = self.domain(url)
+        await limiter.acquire()
+        slot = Slot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except BaseException as e:
+            await limiter.release(time.monotonic() - start, throttled=is_timeout(e), error=True)
+            raise
+        else:
+            throttled = slot.status in THROTTLE_STATUSES or (slot.error is not None and is_timeout(slot.error))
+            await limiter.release(time.monotonic() - start, throttled=throttled, error=throttled or slot.error is not None)
+
+    def metrics(self):
+        return {domain: limiter.metrics() for domain, limiter in self._domains.items()}
+
+
+def parse_ceilings(value):
+    # "realestate.co.jp=8,example.com=2" -> {"realestate.co.jp": 8, "example.com": 2}
+    ceilings = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        domain, _, limit = part.partition("=")
+        ceilings[domain.strip()] = int(limit)
+    return ceilings
+
+
+# every live limiter , for the metrics endpoint (apis/scrapers_api.py)
+_limiters = weakref.WeakSet()
+
+def make_limiter(name = "scraper") -> AdaptiveLimiter:
+    """
+    Limiter configured from the env . One per scraper / updater instance : asyncio primitives are
+    bound to the loop they first run in , and every background run gets its own loop .
+    """
+    limiter = AdaptiveLimiter(
+        initial=int(os.getenv("SCRAPER_INITIAL_CONCURRENCY", 5)),
+        max_limit=int(os.getenv("SCRAPER_MAX_CONCURRENCY", 10)),
+        ceilings=parse_ceilings(os.getenv("SCRAPER_DOMAIN_CEILINGS", "")),
+        target_latency=float(os.getenv("SCRAPER_TARGET_LATENCY", 8.0)),
+    )
+    limiter.name = name
+    _limiters.add(limiter)
+    return limiter
+
+def limiter_metrics():
+    return [{"name": limiter.name, "domains": limiter.metrics()} for limiter in list(_limiters)]
@@ -0,0 +1,169 @@
+import os
+import io
+import gzip
+import json
+import secrets
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # optional , only needed for compression="zstd"
+    zstandard = None
+
+from utils.logger import get_logger
+
+arc_log = get_logger("RawArchive","scraper")
+
+# Append-only JSONL archive of raw scraped listings , one file per process and run :
+#   data/raw/<name>/<name>-<run_id>-<pid>.jsonl[.gz|.zst]
+# run_id is the start stamp of the run (YYYYmmddTHHMMSSffffff_<random hex>) , shared by the coordinator and all of its
+# worker processes (see scraper/japan/realestate/workers.py) , so the files of one run group together .
+# Writes only ever append (no read-modify-write) , runs older than keep_runs are deleted ,
+# iter_records streams them back one record at a time .
+
+SUFFIXES = {None: ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _open_write(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "at", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("compression='zstd' needs the zstandard package , use 'gzip' or None instead")
+        raw = open(path, "ab")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw, closefd=True), encoding="utf-8")
+    return open(path, "a", encoding="utf-8")
+
+
+def _open_read(path):
+    name = str(path)
+    if name.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"reading {path} needs the zstandard package")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def new_run_id():
+    # start time to the microsecond (sorts runs oldest first) + a random suffix , so two runs started
+    # together never share an id . No "-" in it , runs_of splits the file name on "-" .
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{secrets.token_hex(3)}"
+
+
+def run_files(root, name):
+    """Run files of an archive , oldest first (the run id in the name sorts them) ."""
+    folder = Path(root) / name
+    if not folder.exists():
+        return []
+    return sorted(p for p in folder.iterdir() if p.name.startswith(f"{name}-") and ".jsonl" in p.name)
+
+
+def runs_of(root, name):
+    """{run_id : [files of every process of that run]} , oldest run first ."""
+    runs = {}
+    for path in run_files(root, name):
+        run_id = path.name[len(name) + 1:].split("-")[0]
+        runs.setdefault(run_id, []).append(path)
+    return runs
+
+
+def iter_records(root, name, runs = "latest"):
+    """
+    Streams the archived records , one dict at a time .
+    runs : "latest" (all files of the newest run) , "all" , or an int for the newest n runs (0 = none) .
+    A truncated last line (crash mid-write) is skipped .
+    """
+    grouped = runs_of(root, name)
+    run_ids = list(grouped)
+    if runs == "latest":
+        run_ids = run_ids[-1:]
+    elif runs != "all":
+        n = int(runs)
+        run_ids = run_ids[-n:] if n > 0 else []
+    files = [path for run_id in run_ids for path in grouped[run_id]]
+
+    for path in files:
+        try:
+            with _open_read(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        arc_log.warning(f"skipped a truncated record in {path}")
+        except EOFError:
+            # compressed stream cut by a crash , everything before it was already yielded
+            arc_log.warning(f"{path} ends early (interrupted run)")
+
+
+class RawArchive:
+    def __init__(self, root, name, compression = None, keep_runs = None):
+        """
+        compression : "gzip" , "zstd" or "none" , None reads RAW_ARCHIVE_COMPRESSION (default gzip) .
+        keep_runs   : runs kept per archive (all process files of a run count as one) , older ones are
+                      deleted on rotate (RAW_ARCHIVE_KEEP_RUNS , 30) . 0 keeps only the run being written .
+        """
+        if compression is None:
+            compression = os.getenv("RAW_ARCHIVE_COMPRESSION", "gzip")
+        if compression in ("none", ""):
+            compression = None
+        if compression not in SUFFIXES:
+            raise ValueError(f"Unknown compression {compression!r} , use one of {list(SUFFIXES)}")
+
+        self.root = Path(root)
+        self.name = name
+        self.compression = compression
+        self.keep_runs = keep_runs if keep_runs is not None else int(os.getenv("RAW_ARCHIVE_KEEP_RUNS", 30))
+        if self.keep_runs < 0:
+            raise ValueError(f"keep_runs must be >= 0 , got {self.keep_runs}")
+        self.run_id = None
+        self.path = None
+        self._file = None
+        self.written = 0
+
+    def rotate(self, run_id = None):
+        """
+        Starts this process's file of a run , then prunes the oldest runs .
+        run_id : id shared by the processes of one run , None starts a new run .
+        """
+        self.close()
+        folder = self.root / self.name
+        folder.mkdir(parents=True, exist_ok=True)
+
+        self.run_id = run_id or new_run_id()
+        self.path = folder / f"{self.name}-{self.run_id}-{os.getpid()}{SUFFIXES[self.compression]}"
+        self._file = _open_write(self.path, self.compression)
+        self.written = 0
+
+        runs = runs_of(self.root, self.name)
+        keep = set(list(runs)[-self.keep_runs:]) if self.keep_runs > 0 else set()
+        keep.add(self.run_id)
+        for old_run, files in runs.items():
+            if old_run not in keep:
+                for old in files:
+                    old.unlink(missing_ok=True)
+
+        arc_log.info(f"Archiving raw listings to {self.path}")
+        return self.path
+
+    def append(self, records):
+        if isinstance(records, dict):
+            records = [records]
+        if self._file is None:
+            self.rotate()
+
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        self.written += len(records)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            arc_log.info(f"Closed {self.path} ({self.written} records)")
+            self._file = None
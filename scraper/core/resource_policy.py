@@ -0,0 +1,62 @@
+import re
+
+from utils.logger import get_logger
+
+scr_log = get_logger("ResourcePolicy","scraper")
+
+# Subresources the extractors never need : they only read DOM text and img src attributes ,
+# so images / fonts / media and third party trackers are aborted before they hit the network.
+
+DEFAULT_BLOCKED_TYPES = {"image", "media", "font"}
+
+DEFAULT_BLOCKED_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"googlesyndication\.com",
+    r"doubleclick\.net",
+    r"facebook\.(net|com)/tr",
+    r"connect\.facebook\.net",
+    r"hotjar\.com",
+    r"clarity\.ms",
+    r"bat\.bing\.com",
+    r"criteo\.(com|net)",
+    r"adservice\.google\.",
+]
+
+
+class ResourcePolicy:
+    def __init__(self, blocked_types=None, blocked_patterns=None):
+        """
+        blocked_types    : playwright resource types to abort (image , font , media , stylesheet , script ...) .
+        blocked_patterns : regexes , any request url matching one is aborted whatever its type .
+        Stylesheets are left alone by default , the overlay clicks rely on the page layout .
+        """
+        self.blocked_types = set(DEFAULT_BLOCKED_TYPES if blocked_types is None else blocked_types)
+        patterns = DEFAULT_BLOCKED_PATTERNS if blocked_patterns is None else blocked_patterns
+        self.blocked_patterns = list(patterns)
+        self._url_re = re.compile("|".join(f"(?:{p})" for p in self.blocked_patterns)) if self.blocked_patterns else None
+
+        self.blocked = 0
+        self.allowed = 0
+
+    def should_block(self, resource_type, url):
+        if resource_type in self.blocked_types:
+            return True
+        return bool(self._url_re and self._url_re.search(url))
+
+    async def handle(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked += 1
+            await route.abort("blockedbyclient")
+        else:
+            self.allowed += 1
+            # fallback (not continue_) so routes registered before this one , eg : a HAR replay , still apply
+            await route.fallback()
+
+    async def apply(self, context):
+        await context.route("**/*", self.handle)
+        scr_log.info(f"Blocking resource types {sorted(self.blocked_types)} and {len(self.blocked_patterns)} url patterns")
+
+    def metrics(self):
+        return {"blocked": self.blocked, "allowed": self.allowed}
@@ -122,7 +122,8 @@ async def extract_images_via_overlay(page) -> list:
             await overlay_trigger.click()
 
             # 2. Wait until the target image thumbnail buttons load inside the overlay
-            await page.wait_for_selector("button.shrink-0 img", timeout=5000)
+            # attached , not visible : with images blocked the thumbnails may never get a size
+            await page.wait_for_selector("button.shrink-0 img", state="attached", timeout=5000)
 
             # 3. Pull all image sources at once via evaluate_all
             images_src = await page.locator("button.shrink-0 img").evaluate_all(
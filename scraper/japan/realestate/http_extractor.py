@@ -0,0 +1,259 @@
+import re
+
+import httpx
+from lxml import html as lxml_html
+
+from scraper.japan.realestate.xpaths import EXPIRED
+from scraper.japan.realestate.data_extractor import IMAGE_SUFFIX_RE
+
+from utils.logger import get_logger
+
+res_log = get_logger("RealestateHttpExtractor","scraper")
+
+# HTTP-only fast path : the listing fields are server rendered , so a plain GET + lxml gives the
+# same dict as extract_listing without a browser tab . Returns None whenever the page does not
+# look like what the browser path expects , the caller then falls back to Playwright .
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+
+BLOCK_TAGS = {"div", "p", "li", "ul", "ol", "tr", "table", "section", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def has_classes(*names):
+    return " and ".join(has_class(name) for name in names)
+
+
+# xpath versions of the selectors used by extract_static_dom_data
+LOCATION = f"//h4[{has_class('text-xl')}]"
+DETAILS = f"//*[{has_class('property-details')}]"
+DETAILS_TITLE = f".//*[{has_class('property-details-title')}]"
+DETAILS_CONTENT = f".//*[{has_class('property-details-content')}]"
+ADDITIONAL = f"//*[{has_class('property-additional-details')}]"
+ADDITIONAL_TITLE = f".//*[{has_class('property-additional-details-title')}]"
+ADDITIONAL_CONTENT = f".//*[{has_class('property-additional-details-content')}]"
+AVAILABLE_FROM = "//span[contains(., 'Available From:')]/following-sibling::*[1]"
+SECTION_HEADINGS = f"//h4[{has_classes('font-semibold', 'text-2xl')}]"
+STATION_BLOCKS = f"//*[{has_classes('grid', 'gap-1')}]"
+FEATURES = f"//div[{has_classes('border', 'bg-white', 'border-gray-200', 'rounded-lg')}]"
+AGENT = f"//*[{has_classes('card', 'max-w-sm')}]//*[{has_class('card-title')}]"
+THUMBNAILS = f"//button[{has_class('shrink-0')}]//img/@src"
+
+
+def inner_text(el):
+    """Rough innerText : <br> and block elements break lines , whitespace collapsed per line ."""
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in ("script", "style", "svg"):
+            return
+        if node.tag == "br":
+            parts.append("\n")
+        elif node.tag in BLOCK_TAGS:
+            parts.append("\n")
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+        if node.tag in BLOCK_TAGS:
+            parts.append("\n")
+
+    walk(el)
+    lines = [re.sub(r"[ \t\r\f\v\xa0]+", " ", line).strip() for line in "".join(parts).split("\n")]
+    text = "\n".join(lines).strip()
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def first(tree, xpath):
+    found = tree.xpath(xpath)
+    return found[0] if found else None
+
+
+def parse_listing_html(source):
+    """
+    Same dict shape as extract_listing (raw titles as keys + images) .
+    Returns {} for an expired listing and None when the required nodes are missing .
+    """
+    tree = lxml_html.fromstring(source)
+
+    if tree.xpath(EXPIRED):
+        return {}
+
+    location = first(tree, LOCATION)
+    details = tree.xpath(DETAILS)
+    if location is None or not details:
+        return None
+
+    result = {"Location": inner_text(location)}
+
+    # 2. Size and Type
+    for el in details:
+        title, content = first(el, DETAILS_TITLE), first(el, DETAILS_CONTENT)
+        if title is not None and content is not None:
+            result[inner_text(title)] = inner_text(content)
+
+    # 3. Available From Date
+    available = first(tree, AVAILABLE_FROM)
+    if available is not None:
+        result["Available From"] = inner_text(available)
+
+    # 4. Price & Additional Specs
+    for el in tree.xpath(ADDITIONAL):
+        title, content = first(el, ADDITIONAL_TITLE), first(el, ADDITIONAL_CONTENT)
+        if title is not None and content is not None:
+            result[inner_text(title)] = inner_text(content)
+
+    # 5-6. Descriptions and Date Updated
+    for h4 in tree.xpath(SECTION_HEADINGS):
+        heading = inner_text(h4)
+        body = h4.getnext()
+        if body is None:
+            continue
+        if "Building Description" in heading and "Description" not in result:
+            result["Description"] = inner_text(body)
+        elif "Property Description" in heading and "Property Description" not in result:
+            result["Property Description"] = inner_text(body)
+        elif "Date Updated" in heading and "Date Updated" not in result:
+            result["Date Updated"] = inner_text(body)
+
+    # 7. Transportation (closest station only)
+    station, walk = None, None
+    for container in tree.xpath(STATION_BLOCKS):
+        first_div = first(container, "./div")
+        if first_div is None:
+            continue
+        name_el = first(first_div, f".//*[{has_class('font-semibold')}]")
+        walk_el = first(first_div, f".//li[{has_class('has-icon')}]")
+        if name_el is not None and walk_el is not None and "Station" in inner_text(name_el):
+            station, walk = inner_text(name_el), inner_text(walk_el)
+            break
+    result["ns_raw_name"] = station
+    result["ns_raw_time"] = walk
+
+    # 8. Features
+    features = list(dict.fromkeys(text for text in (inner_text(el) for el in tree.xpath(FEATURES)) if text))
+    if features:
+        result["Features"] = features
+
+    # 9. Agent Name
+    agent = first(tree, AGENT)
+    if agent is not None:
+        result["Agent"] = inner_text(agent)
+
+    # images : thumbnails of the gallery overlay , when it is in the html . The gallery is usually
+    # rendered client side , then images stays empty and the static fields are still used : a listing
+    # without image rows gets its gallery from the metadata updater (extract_images_via_overlay) .
+    images = [IMAGE_SUFFIX_RE.sub("", src) for src in tree.xpath(THUMBNAILS) if src]
+    result["images"] = list(dict.fromkeys(images))
+
+    return result
+
+
+def classify_liveness(status_code, source):
+    """
+    "active" / "expired" from a plain GET of a listing page , None when it is ambiguous
+    (blocked , server error , unexpected layout) and only the browser can tell .
+    """
+    if status_code in (404, 410):
+        return "expired"
+    if status_code != 200 or not source:
+        return None
+
+    tree = lxml_html.fromstring(source)
+    if tree.xpath(EXPIRED):
+        return "expired"
+    if first(tree, LOCATION) is not None and tree.xpath(DETAILS):
+        return "active"
+    return None
+
+
+class HttpListingExtractor:
+    def __init__(self, timeout=15.0, max_connections=20, limiter=None):
+        self.timeout = timeout
+        self.limiter = limiter  # AdaptiveLimiter shared with the browser path , same domain budget
+        self.max_connections = max_connections
+        self._client = None
+
+        self.hits = 0
+        self.fallbacks = 0
+        self.gallery_deferred = 0  # http hits whose gallery is left to the metadata updater
+        self.probes = {"active": 0, "expired": 0, "ambiguous": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT, "Accept-Language": "en"},
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections),
+            )
+        return self._client
+
+    async def extract(self, url):
+        """Listing dict , {} if expired , None when the browser path is needed ."""
+        try:
+            if self.limiter:
+                async with self.limiter.slot(url) as slot:
+                    res = await self.client.get(url)
+                    slot.status = res.status_code
+            else:
+                res = await self.client.get(url)
+        except httpx.HTTPError as e:
+            res_log.warning(f"http fetch failed for {url} : {e}")
+            self.fallbacks += 1
+            return None
+
+        if res.status_code != 200:
+            self.fallbacks += 1
+            return None
+
+        try:
+            data = parse_listing_html(res.content)
+        except Exception as e:
+            res_log.error(f"error parsing {url} : {e}")
+            data = None
+
+        if data is None:
+            self.fallbacks += 1
+        else:
+            self.hits += 1
+            if data and not data["images"]:
+                self.gallery_deferred += 1
+        return data
+
+    async def probe(self, url):
+        """Liveness only : "active" , "expired" or None (ask the browser) , see classify_liveness ."""
+        try:
+            if self.limiter:
+                async with self.limiter.slot(url) as slot:
+                    res = await self.client.get(url)
+                    slot.status = res.status_code
+            else:
+                res = await self.client.get(url)
+        except httpx.HTTPError as e:
+            res_log.warning(f"liveness probe failed for {url} : {e}")
+            self.probes["ambiguous"] += 1
+            return None
+
+        try:
+            status = classify_liveness(res.status_code, res.content)
+        except Exception as e:
+            res_log.error(f"error sniffing {url} : {e}")
+            status = None
+
+        self.probes[status or "ambiguous"] += 1
+        return status
+
+    def metrics(self):
+        return {"http": self.hits, "browser_fallback": self.fallbacks, "gallery_deferred": self.gallery_deferred, "probes": self.probes}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
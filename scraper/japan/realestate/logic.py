@@ -1,16 +1,37 @@
+import os
 import asyncio
+from urllib.parse import urlsplit
 
 from scraper.core.base_scraper import BaseScraper
-from scraper.japan.realestate.xpaths import CARDS,INFO_TABLE
+from scraper.japan.realestate.xpaths import CARDS_CSS,INFO_TABLE
 from scraper.japan.realestate.data_extractor import extract_listing
-from scraper.japan.realestate.clean_data import clean_all_listings
+from scraper.japan.realestate.http_extractor import HttpListingExtractor
+from scraper.japan.realestate.clean_data import clean_all_listings,try_parse_currency
 
 from utils.logger import get_logger
 
 res_log = get_logger("RealestateScraper","scraper")
 
+# site root , overridable to point the scraper at a mirror / local fixture server
+BASE_URL = os.getenv("REALESTATE_BASE_URL", "https://realestate.co.jp").rstrip("/")
+DOMAIN = urlsplit(BASE_URL).hostname
+
+def listing_url(listing_id):
+    return f"{BASE_URL}/en/forsale/view/{listing_id}"
+
 class RealestateScraperLogic(BaseScraper):
 
+    def __init__(self,*args,use_http = True,**kwargs):
+        super().__init__(*args,**kwargs)
+        # listings are fetched over plain http first , a browser tab only opens when that fails
+        self.http_extractor = HttpListingExtractor(limiter=self.limiter) if use_http else None
+
+    async def close_browser(self):
+        if self.http_extractor:
+            res_log.info(f"Listing extraction : {self.http_extractor.metrics()}")
+            await self.http_extractor.aclose()
+        await super().close_browser()
+
     @staticmethod
     async def make_url(ids : list,session_seen_id : set) -> list:
         listings = []
@@ -18,7 +39,7 @@ class RealestateScraperLogic(BaseScraper):
             if id not in session_seen_id:
                 listings.append({
                     "listing_id" : id,
-                    "url" : f"https://realestate.co.jp/en/forsale/view/{id}"
+                    "url" : listing_url(id)
                 })
 
                 session_seen_id.add(id)
@@ -27,64 +48,97 @@ class RealestateScraperLogic(BaseScraper):
         return listings
 
 
-    async def get_cards_id(self,url):
+    async def get_cards(self,url):
+        """
+        Harvests every card of a results page in one evaluate call .
+        Returns [{"listing_id" , "price_yen" , "thumbnail"}] , price / thumbnail are None when the card has none .
+        """
         await self.main_page.goto(url, wait_until="domcontentloaded")
 
-        cards = await self.main_page.query_selector_all(CARDS)
-        res_log.info(f"found {len(cards)} cards")
-        ids = []
-
+        cards = await self.main_page.evaluate("""(selector) => {
+            return Array.from(document.querySelectorAll(selector)).map(card => {
+                const price = card.innerText.match(/(¥|JPY)\\s*[\\d,]+/);
+                const img = card.querySelector('img');
+                return {
+                    listing_id: card.id.replace('property-', ''),
+                    price: price ? price[0] : null,
+                    thumbnail: img ? (img.getAttribute('src') || img.getAttribute('data-src')) : null
+                };
+            });
+        }""", CARDS_CSS)
+
+        cards = [card for card in cards if card["listing_id"]]
         for card in cards:
-            prop_id = await card.get_attribute("id")
-            if prop_id:
-                ids.append(prop_id.removeprefix("property-"))
-            else:
-                res_log.error("link not found.")
-        res_log.info("found ids")
-        return ids
-
-    async def collect_data(self,ids:list,session_seen_id:set):
-        listing = await self.make_url(ids,session_seen_id)
+            card["price_yen"] = try_parse_currency(card.pop("price"))
 
-        scraped_results = []
-
-        async def handle_page(item, index):
-            page = await self.context.new_page()
-
-            try:
-                url = item['url']
-                listing_id = item['listing_id']
-                await page.goto(url, timeout=30000, wait_until="domcontentloaded")
-                res_log.info(f"[{index}] Opened: {url}")
+        res_log.info(f"found {len(cards)} cards")
+        return cards
 
-                data = await extract_listing(page)
+    async def get_cards_id(self,url):
+        cards = await self.get_cards(url)
+        return [card["listing_id"] for card in cards]
 
-                if data:
-                    data["source_listing_id"] = listing_id
-                    scraped_results.append(data)
-                else:
-                    res_log.warning(f"[{index}] No data extracted: {url}")
+    @staticmethod
+    def triage_cards(cards,known):
+        """
+        Splits harvested cards against the stored listings (DbManagerV1.get_known_listings) :
+        new ids , known ids whose card price changed , and known unchanged ids (no detail visit needed).
+        """
+        new_ids , changed_ids , unchanged_ids = [] , [] , []
+        for card in cards:
+            stored = known.get(card["listing_id"])
+            if stored is None:
+                new_ids.append(card["listing_id"])
+            elif card["price_yen"] is not None and card["price_yen"] != stored["price_yen"]:
+                changed_ids.append(card["listing_id"])
+            else:
+                unchanged_ids.append(card["listing_id"])
+        return new_ids , changed_ids , unchanged_ids
+
+    async def extract_with_browser(self,url,index):
+        async with self.limiter.slot(url) as slot, self.pages.page() as page:
+            response = await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+            slot.status = response.status if response else None
+            res_log.info(f"[{index}] Opened: {url}")
+            return await extract_listing(page)
+
+    async def scrape_listing(self,item,index):
+        """
+        Raw (uncleaned) data of one listing , None when nothing could be extracted .
+        item : {"listing_id" , "url"} as built by make_url .
+        """
+        url = item['url']
+        listing_id = item['listing_id']
+
+        try:
+            data = None
+            if self.http_extractor:
+                data = await self.http_extractor.extract(url)
+            if data is None:
+                data = await self.extract_with_browser(url, index)
+            else:
+                res_log.info(f"[{index}] Fetched over http: {url}")
 
-            except KeyboardInterrupt:
-                res_log.warning("process stopped by the user.")
-                await page.close()
+            if data:
+                data["source_listing_id"] = listing_id
+                return data
+            res_log.warning(f"[{index}] No data extracted: {url}")
 
-            except Exception as e:
-                res_log.error(f"[{index}] Error scraping {url}: {e}")
-                await page.close()
+        except KeyboardInterrupt:
+            res_log.warning("process stopped by the user.")
 
-            finally:
-                await page.close()
+        except Exception as e:
+            res_log.error(f"[{index}] Error scraping {url}: {e}")
 
-        # Limit concurrency (to avoid hitting the site too hard)
-        sem = asyncio.Semaphore(5)
+        return None
 
-        async def limited_task(i, item):
-            async with sem:
-                await handle_page(item, i )
+    async def collect_data(self,ids:list,session_seen_id:set):
+        listing = await self.make_url(ids,session_seen_id)
 
-        await asyncio.gather(*(limited_task(i, item) for i, item in enumerate(listing)))
+        # concurrency is bounded per domain by self.limiter (to avoid hitting the site too hard)
+        results = await asyncio.gather(*(self.scrape_listing(item, i) for i, item in enumerate(listing)))
+        scraped_results = [data for data in results if data]
 
         res_log.info(f"* Done scraping {len(scraped_results)} pages.")
         clean_scraped_results = clean_all_listings(scraped_results)
-        return clean_scraped_results
\ No newline at end of file
+        return clean_scraped_results
@@ -2,7 +2,9 @@ import asyncio
 
 from scraper.japan.realestate.xpaths import EXPIRED
 from scraper.core.base_scraper import BaseScraper
+from scraper.japan.realestate.logic import listing_url
 from scraper.japan.realestate.data_extractor import extract_images_via_overlay,extract_static_dom_data
+from scraper.japan.realestate.clean_data import clean_and_normalize_dict
 
 from manage_db.db_manager_v1 import DbManagerV1
 from manage_db.image_db_manager import ImageDb
@@ -17,77 +19,94 @@ class MetaDataUpdater(BaseScraper):
         super().__init__(*args,**kwargs)
         self.db = DbManagerV1(table_name="jp_realestate_v1")
         self.db_img = ImageDb()
+        # listings rewritten vs skipped by the content hash check , per run
+        self.written = 0
+        self.skipped = 0
 
     async def update_card(self,listing_ids,urls,image_ids,start_browser = True): #todo : fix the image extraction .
         if start_browser:
             await self.start_browser()
 
-        async def handle_update(listing_id,url,index):
-            page = await self.context.new_page()
+        # status / last_update outcomes , written in one statement per batch off the event loop
+        outcomes = []
+        failed = []  # checks that threw , only their last_metadata_update is bumped
 
-            try:
-                await page.goto(
-                    url,
-                    timeout=15000,
-                    wait_until="domcontentloaded"
-                )
+        async def handle_update(listing_id,url,index,slot):
+            async with self.pages.page() as page:
 
-                await page.wait_for_load_state("networkidle")
-
-                res_updater.info(f"{index} Opened url : {url}")
+                try:
+                    response = await page.goto(
+                        url,
+                        timeout=15000,
+                        wait_until="domcontentloaded"
+                    )
+                    slot.status = response.status if response else None
 
-                if listing_id is None:
-                    res_updater.warning(f"{index} No db entry found for {url}")
-                    return
+                    await page.wait_for_load_state("networkidle")
 
-                element = await page.query_selector(EXPIRED)
-                if element:
-                    res_updater.info(f"{index} Expired message detected : {url}")
-                    self.db.update_status(listing_id,"expired")
-                    self.db.update_last_update(listing_id)
-                    return
-                else:
-                    self.db.update_status(listing_id, "active")
-                    res_updater.info(f"{index} is live")
+                    res_updater.info(f"{index} Opened url : {url}")
 
-                    new_data = await extract_static_dom_data(page)
+                    if listing_id is None:
+                        res_updater.warning(f"{index} No db entry found for {url}")
+                        return
 
-                    self.db.update_listing(listing_id,new_data)
+                    element = await page.query_selector(EXPIRED)
+                    if element:
+                        res_updater.info(f"{index} Expired message detected : {url}")
+                        outcomes.append((listing_id,"expired"))
+                        return
+                    else:
+                        res_updater.info(f"{index} is live")
 
-                    if listing_id not in image_ids:
-                        try:
-                            await page.wait_for_selector("figure.cursor-pointer", timeout=5000)
-                        except:
-                            res_updater.info(f"{listing_id} has no gallery")
+                        # cleaned like a fresh scrape , so keys / price_yen match what insert stored
+                        new_data = clean_and_normalize_dict(await extract_static_dom_data(page))
 
-                        images = await extract_images_via_overlay(page) #todo: update data in update_status
-                        self.db_img.insert_ima_url(listing_id,images)
-                        res_updater.info(f"found image for {index}")
+                        _id , changed = await asyncio.to_thread(self.db.update_listing,listing_id,new_data)
+                        if changed:
+                            self.written += 1
+                        elif _id is not None:
+                            self.skipped += 1
 
-                self.db.update_last_update(listing_id)
+                        if listing_id not in image_ids:
+                            try:
+                                await page.wait_for_selector("figure.cursor-pointer", state="attached", timeout=5000)
+                            except:
+                                res_updater.info(f"{listing_id} has no gallery")
 
-            except Exception as e:
-                res_updater.exception(f"Error during update:{e}")
+                            images = await extract_images_via_overlay(page)
+                            await asyncio.to_thread(self.db_img.insert_ima_url,listing_id,images)
+                            res_updater.info(f"found image for {index}")
 
-            finally:
-                await page.close()
+                    outcomes.append((listing_id,"active"))
 
-        sem = asyncio.Semaphore(5)
+                except Exception as e:
+                    slot.error = e
+                    res_updater.exception(f"Error during update:{e}")
+                    if listing_id is not None:
+                        failed.append(listing_id)
 
         async def limit_task(i, listing_id, url):
-            async with sem:
-                await handle_update(listing_id=listing_id, url=url, index=i)
+            # adaptive per-domain concurrency , see scraper/core/rate_limiter.py
+            async with self.limiter.slot(url) as slot:
+                await handle_update(listing_id=listing_id, url=url, index=i, slot=slot)
 
         await asyncio.gather(
             *(limit_task(i, listing_id, url) for i, (listing_id, url) in enumerate(zip(listing_ids, urls)))
         )
 
+        await asyncio.to_thread(self.db.update_status_bulk,outcomes)
+        # a failing listing is not ranked first again next cycle
+        await asyncio.to_thread(self.db.mark_checked,"metadata",failed)
+        res_updater.info(f"Metadata : {self.written} listings written , {self.skipped} unchanged skipped")
+
         if start_browser:
-            self.db.close_conn()
             await self.close_browser()
 
-    async def continuous_update(self, interval_sec=300,batch_wise = True , max_batches = 1):
+    async def continuous_update(self, interval_sec=300,batch_wise = True , max_batches = 1 , min_pause_sec = 30):
+        # min_pause_sec : pause before re-ranking after a full budget , so a failing site is never crawled back to back
         await self.start_browser()
+        self.written = 0
+        self.skipped = 0
 
         BATCH_SIZE = 100
 
@@ -95,35 +114,28 @@ class MetaDataUpdater(BaseScraper):
             while True:
                 res_updater.info("Starting update cycle")
 
-                df = self.db.get_active_ids_metadata()
                 image_ids = self.db_img.get_listing_ids_with_images()
 
-                #make urls
-                df["source_listing_id"] = df["source_listing_id"].apply(lambda ids : f"https://realestate.co.jp/en/forsale/view/{ids}")
-
-                listing_ids = df["id"].tolist()
-                urls = df["source_listing_id"].tolist()
-
-                if not listing_ids or not urls:
-                    res_updater.warning("No active listing found")
-                    if batch_wise:
-                        break
-                    await asyncio.sleep(interval_sec)
-                    continue
-
-                for start in range(0, len(listing_ids), BATCH_SIZE):
-                    end = min(start + BATCH_SIZE, len(listing_ids))
+                # highest priority first (see DbManagerV1.refresh_queue) , ranked and read into a list in one
+                # to_thread call before any browser work , every cycle is capped at max_batches batches
+                budget = BATCH_SIZE * max_batches
+                queue = await asyncio.to_thread(self.db.refresh_queue,"metadata",budget)
+                batch_number = 0
+                for start in range(0,len(queue),BATCH_SIZE):
+                    batch = queue[start:start + BATCH_SIZE]
+                    #make urls
+                    listing_ids = [row["id"] for row in batch]
+                    urls = [listing_url(row["source_listing_id"]) for row in batch]
 
                     await self.update_card(
-                        listing_ids=listing_ids[start:end],
-                        urls=urls[start:end],
+                        listing_ids=listing_ids,
+                        urls=urls,
                         image_ids=image_ids,
                         start_browser=False
                     )
 
-                    self.db.conn.commit()
-
-                    batch_number = start // BATCH_SIZE + 1
+                    batch_number += 1
+                    end = start + len(listing_ids)
 
                     res_updater.info(
                         f"Finished batch {batch_number} "
@@ -131,12 +143,20 @@ class MetaDataUpdater(BaseScraper):
                     )
 
                     if batch_wise and batch_number >= max_batches:
-                        if batch_wise and batch_number >= max_batches:
-                            res_updater.info(f"Stopped the updater after {batch_number}")
-                            return
+                        res_updater.info(f"Stopped the updater after {batch_number}")
+                        return
+
+                if batch_number == 0:
+                    res_updater.warning("No active listing found")
+                    if batch_wise:
+                        break
 
 
                 res_updater.info("Update cycle completed.")
+                if len(queue) == budget:
+                    # a full budget means more listings are due , rank the next budget after a short pause
+                    await asyncio.sleep(min(min_pause_sec,interval_sec))
+                    continue
                 await asyncio.sleep(interval_sec)
 
         except KeyboardInterrupt:
@@ -145,7 +165,6 @@ class MetaDataUpdater(BaseScraper):
             res_updater.exception(f"Error {e}")
 
         finally:
-            self.db.close_conn()
             await self.close_browser()
 
 if __name__ == "__main__":
@@ -1,13 +1,29 @@
+import time
 import asyncio
 
-from scraper.japan.realestate.logic import RealestateScraperLogic
+from scraper.japan.realestate.logic import RealestateScraperLogic,BASE_URL,DOMAIN
+from scraper.japan.realestate.clean_data import clean_all_listings
+from manage_db.frontier_db_manager import CrawlFrontier, worker_name
 from utils.logger import get_logger
 
 res_log = get_logger("RealestateScraper","scraper")
 
+# end of stream marker passed down the pipeline queues
+DONE = object()
+
 class RealestateScraperRunner:
-    def __init__(self):
-        self.scraper = RealestateScraperLogic("jp_realestate_v1", "realestate.co")
+    def __init__(self,detail_workers = None,db_batch_size = 20,table_name = "jp_realestate_v1",source = "realestate.co",json_file = "real_estate",run_id = None):
+        self.scraper = RealestateScraperLogic(table_name, source)
+        # enough workers to reach the domain ceiling , the adaptive limiter decides how many actually run
+        self.detail_workers = detail_workers or self.scraper.limiter.ceiling(DOMAIN)
+        self.db_batch_size = db_batch_size
+        self.json_file = json_file  # raw archive name under data/raw , None = no archive
+        self.run_id = run_id  # raw archive run shared with the other worker processes , None = own run
+
+        # discovered listings and the page cursor live in postgres , a restarted run picks them up
+        self.frontier = CrawlFrontier(self.scraper.listing_db.source)
+        self.worker = worker_name()
+        self.in_flight = 0
 
     @staticmethod
     def check_last_page(previous_ids,ids,page_no):
@@ -18,71 +34,293 @@ class RealestateScraperRunner:
         else:
             return False
 
-    # The main runner function.
-    async def run(self,building_type = None,max_pages = 1):  #None = all property
-        await self.scraper.start_browser()
+    @staticmethod
+    def page_url(building_type,page_no):
+        if not building_type:
+            return f"{BASE_URL}/en/forsale?order=date_entered_ranking-desc&page={page_no}"
+        return f"{BASE_URL}/en/forsale?building_type={building_type}&order=date_entered_ranking-desc&page={page_no}"
+
+    @staticmethod
+    def drain(queue,first,limit):
+        # first item + whatever is already waiting (up to limit) , batches grow only when the writer lags
+        batch = [first]
+        done = False
+        while len(batch) < limit and not queue.empty():
+            item = queue.get_nowait()
+            if item is DONE:
+                done = True
+                break
+            batch.append(item)
+        return batch , done
+
+    # --pipeline stages--
+    # card harvest -> crawl_frontier -> claim -> detail fetch (detail_workers) -> clean -> db writer -> image writer
+    # every in-process hop is a bounded queue , so a slow stage back-pressures the ones before it .
+
+    async def harvest(self,building_type,max_pages,incremental):
+        crawl_key = building_type or "all"
+        # resumes from the page a crashed / stopped run reached
+        page_no = await asyncio.to_thread(self.frontier.get_next_page,crawl_key)
+        last_page_no = page_no + max_pages - 1
+        if page_no > 1:
+            res_log.info(f"Resuming crawl {crawl_key} from page {page_no}")
 
-        page_no = 1
         previous_ids = None
         session_seen_id = set()
 
-        self.scraper.clear_json("real_estate")
+        while page_no <= last_page_no:
+            res_log.info(f"scraping page {page_no}")
+            url = self.page_url(building_type,page_no)
+
+            cards = await self.scraper.get_cards(url)
+
+            if len(cards) == 0:
+                res_log.warning(f"{len(cards)} ids in page , retrying page : {url}.")
+                cards = await self.scraper.get_cards(url)
+                if len(cards) == 0:
+                    res_log.warning(f"No cards in {url}; stopping.")
+                    break
+            ids = [card["listing_id"] for card in cards]
+
+            last_page = self.check_last_page(previous_ids,ids,page_no)
+            if last_page:
+                break
+            previous_ids = ids
 
+            # Known listings whose card shows no change skip the detail page
+            known = await asyncio.to_thread(self.scraper.listing_db.get_known_listings,ids)
+            new_ids , changed_ids , unchanged_ids = self.scraper.triage_cards(cards,known)
+            res_log.info(f"page {page_no} : {len(new_ids)} new , {len(changed_ids)} changed , {len(unchanged_ids)} unchanged")
+
+            changed = set(changed_ids)
+            items = await self.scraper.make_url(new_ids + changed_ids,session_seen_id)
+            for item in items:
+                # db_id set = refresh of a stored listing , None = insert
+                item["db_id"] = known[item["listing_id"]]["id"] if item["listing_id"] in changed else None
+
+            await asyncio.to_thread(self.frontier.add_discovered,items)
+            await asyncio.to_thread(self.frontier.save_next_page,crawl_key,page_no + 1)
+
+            if incremental and not new_ids:
+                res_log.info(f"Page {page_no} is entirely known , incremental crawl stopped.")
+                break
+
+            page_no += 1
+
+        # reached only when the crawl ended normally , a crash keeps the saved page for the next run
+        await asyncio.to_thread(self.frontier.reset_cursor,crawl_key)
+
+    async def feed(self,detail_q,harvest_done,poll_sec = 0.5,idle_sec = 0):
+        # moves claimed frontier rows into the detail queue until nothing is left to do
+        # idle_sec : keep polling that long after the last claim (workers fed by another harvester)
+        index = 0
+        last_claim = time.monotonic()
+        while True:
+            # claim only what the workers can start soon , the rest stays claimable by other workers
+            room = self.detail_workers * 2 - self.in_flight
+            if room <= 0:
+                await asyncio.sleep(poll_sec)
+                continue
+
+            claimed = await asyncio.to_thread(self.frontier.claim,room,self.worker)
+            if claimed:
+                last_claim = time.monotonic()
+            for item in claimed:
+                self.in_flight += 1
+                await detail_q.put((index,item))
+                index += 1
+
+            if not claimed:
+                # failed items go back to pending , so only stop once nothing is in flight either
+                idle = time.monotonic() - last_claim >= idle_sec
+                if harvest_done.is_set() and self.in_flight == 0 and idle:
+                    return
+                await asyncio.sleep(poll_sec)
+
+    async def finish(self,items,error = None):
+        # records the outcome of items in the frontier , frees their in-flight slot
         try:
-            while page_no <= max_pages:
+            if error is None:
+                await asyncio.to_thread(self.frontier.mark_done,[item["frontier_id"] for item in items],self.worker)
+            else:
+                for item in items:
+                    await asyncio.to_thread(self.frontier.mark_failed,item["frontier_id"],error,self.worker)
+        except Exception as e:
+            res_log.error(f"Error updating crawl frontier : {e}")
+        finally:
+            self.in_flight -= len(items)
 
-                res_log.info(f"scraping page {page_no}")
+    async def fetch_details(self,detail_q,clean_q):
+        while True:
+            entry = await detail_q.get()
+            if entry is DONE:
+                return
+            index , item = entry
+            try:
+                data = await self.scraper.scrape_listing(item,index)
+                if data:
+                    await clean_q.put((item,data))
+                else:
+                    await self.finish([item],error="no data extracted")
+            except Exception as e:
+                # one bad listing must not kill the worker , its queue would stop being consumed
+                res_log.error(f"Error fetching listing {item['listing_id']} : {e}")
+                await self.finish([item],error=e)
 
-                if not building_type:
-                    url = f"https://realestate.co.jp/en/forsale?order=date_entered_ranking-desc&page={page_no}"
+    async def clean(self,clean_q,db_q):
+        while True:
+            entry = await clean_q.get()
+            if entry is DONE:
+                await db_q.put(DONE)
+                return
+            item , data = entry
+            try:
+                cleaned = clean_all_listings([data])
+                if cleaned:
+                    await db_q.put((item,cleaned[0]))
                 else:
-                    url = f"https://realestate.co.jp/en/forsale?building_type={building_type}&order=date_entered_ranking-desc&page=1"
+                    await self.finish([item],error="cleaning failed")
+            except Exception as e:
+                res_log.error(f"Error cleaning listing {item['listing_id']} : {e}")
+                await self.finish([item],error=e)
 
-                ids = await self.scraper.get_cards_id(url)
+    async def write_db(self,db_q,image_q):
+        stored = 0
+        try:
+            done = False
+            while not done:
+                first = await db_q.get()
+                if first is DONE:
+                    break
+                batch , done = self.drain(db_q,first,self.db_batch_size)
 
-                if len(ids) == 0:
-                    res_log.warning(f"{len(ids)} ids in page , retrying page : {url}.")
-                    ids = await self.scraper.get_cards_id(url)
-                    if len(ids) == 0:
-                        res_log.warning(f"No cards in {url}; stopping.")
-                        break
+                try:
+                    image_less = [(item,{k: v for k, v in listing.items() if k != "images"}) for item,listing in batch]
 
-                last_page = self.check_last_page(previous_ids,ids,page_no)
-                if last_page:
-                    break
-                previous_ids = ids
+                    updates = [(item["db_id"],listing) for item,listing in image_less if item["db_id"] is not None]
+                    if updates:
+                        await self.scraper.refresh_db_v1(updates)
+
+                    id_map = await self.scraper.store_db_v1([listing for item,listing in image_less if item["db_id"] is None])
+
+                    # Collects images only for successful database inserts
+                    for item,listing in batch:
+                        src_id = listing.get("source_listing_id")
+                        if src_id in id_map:
+                            await image_q.put((id_map[src_id],listing["images"]))
+
+                    if self.json_file:
+                        self.scraper.store_json([listing for item,listing in batch],file_name=self.json_file)
+                    stored += len(batch)
+                    await self.finish([item for item,listing in batch])
+                except Exception as e:
+                    res_log.error(f"Error storing batch of {len(batch)} : {e}")
+                    await self.finish([item for item,listing in batch],error=e)
+        finally:
+            await image_q.put(DONE)
+            res_log.info(f"db writer stored {stored} listings")
 
-                data = await self.scraper.collect_data(ids,session_seen_id)
-                image_less_data = [{k: v for k, v in listing.items() if k != "images"} for listing in data]
+    async def write_images(self,image_q):
+        while True:
+            first = await image_q.get()
+            if first is DONE:
+                return
+            batch , done = self.drain(image_q,first,self.db_batch_size)
+            try:
+                # one round trip per batch
+                await self.scraper.store_images(dict(batch))
+            except Exception as e:
+                res_log.error(f"Error storing images of {len(batch)} listings : {e}")
+            if done:
+                return
 
-                id_map = await self.scraper.store_db_v1(image_less_data)
+    async def pipeline(self,producer = None,idle_sec = 0):
+        """
+        Runs the claim -> detail -> clean -> db -> image stages until the frontier is drained .
+        producer : coroutine filling the frontier (harvest) , None for a worker fed by someone else .
+        """
+        harvest_done = asyncio.Event()
+        detail_q = asyncio.Queue(maxsize=self.detail_workers * 2)
+        clean_q = asyncio.Queue(maxsize=self.detail_workers * 2)
+        db_q = asyncio.Queue(maxsize=self.db_batch_size * 2)
+        image_q = asyncio.Queue(maxsize=self.db_batch_size * 2)
 
-                # Generates tasks only for successful database inserts
-                image_tasks = []
-                for listing in data:
-                    src_id = listing.get("source_listing_id")
-                    # Check if the listing successfully generated a database ID
-                    if src_id in id_map:
-                        db_id = id_map[src_id]
-                        image_tasks.append(self.scraper.store_image(db_id, listing["images"]))
+        async def produce():
+            if producer is not None:
+                try:
+                    await producer
+                except Exception as e:
+                    res_log.error(f"Error :{e}")
+            harvest_done.set()
 
-                # Fires all image thread-writes concurrently
-                if image_tasks:
-                    #await asyncio.gather(*image_tasks) later for speed (cant share psycopg2 conns in ImageDb{init})
-                    for task in image_tasks:
-                        await task
-                self.scraper.store_json(data,file_name="real_estate")
+        async def close_stages():
+            # drain : each stage forwards the end marker once everything before it is done
+            await feeder
+            for _ in workers:
+                await detail_q.put(DONE)
+            await asyncio.gather(*workers)
+            await clean_q.put(DONE)
 
-                page_no += 1
+        workers = [asyncio.create_task(self.fetch_details(detail_q,clean_q)) for _ in range(self.detail_workers)]
+        cleaner = asyncio.create_task(self.clean(clean_q,db_q))
+        db_writer = asyncio.create_task(self.write_db(db_q,image_q))
+        image_writer = asyncio.create_task(self.write_images(image_q))
+        feeder = asyncio.create_task(self.feed(detail_q,harvest_done,idle_sec=idle_sec))
+        tasks = [asyncio.create_task(produce()),feeder,*workers,cleaner,db_writer,image_writer,asyncio.create_task(close_stages())]
+
+        try:
+            # every task ends on its own once the frontier is drained . A dead stage stops consuming its queue
+            # (and keeps its items in flight) , so the others would wait forever : fail on the first error instead .
+            done , _ = await asyncio.wait(tasks,return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks,return_exceptions=True)
+
+    # The main runner function.
+    async def run(self,building_type = None,max_pages = 1,incremental = False):  #None = all property
+        # incremental : pages are newest first , so stop after the first page whose cards are all already stored
+        await asyncio.to_thread(self.frontier.create_tables)
+        await self.scraper.start_browser()
+        if self.json_file:
+            self.scraper.open_archive(self.json_file,self.run_id)
 
+        try:
+            await self.pipeline(self.harvest(building_type,max_pages,incremental))
         except Exception as e:
             res_log.error(f"Error :{e}")
         except KeyboardInterrupt:
             res_log.warning(f"scraper stopped by user.")
         finally:
             await self.scraper.close_browser()
+            res_log.info(f"Crawl frontier : {self.frontier.progress()}")
+
+    async def harvest_only(self,building_type = None,max_pages = 1,incremental = False):
+        # fills the frontier for separate worker processes (see scraper/japan/realestate/workers.py)
+        await asyncio.to_thread(self.frontier.create_tables)
+        await self.scraper.start_browser()
+        try:
+            await self.harvest(building_type,max_pages,incremental)
+        finally:
+            await self.scraper.close_browser()
+
+    async def work(self,idle_sec = 30):
+        # worker mode : only drains the frontier , exits after idle_sec without claimable rows
+        await asyncio.to_thread(self.frontier.create_tables)
+        await self.scraper.start_browser()
+        if self.json_file:
+            self.scraper.open_archive(self.json_file,self.run_id)
+        try:
+            await self.pipeline(idle_sec=idle_sec)
+        except Exception as e:
+            res_log.error(f"Worker error :{e}")
+        finally:
+            await self.scraper.close_browser()
 
 if __name__ == "__main__":
     runner = RealestateScraperRunner()
     task = runner.run()
-    asyncio.run(task)
\ No newline at end of file
+    asyncio.run(task)
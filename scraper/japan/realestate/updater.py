@@ -2,6 +2,8 @@ import asyncio
 
 from scraper.japan.realestate.xpaths import EXPIRED
 from scraper.core.base_scraper import BaseScraper
+from scraper.japan.realestate.logic import listing_url
+from scraper.japan.realestate.http_extractor import HttpListingExtractor
 
 from manage_db.db_manager_v1 import DbManagerV1
 
@@ -11,57 +13,76 @@ res_updater = get_logger("RealEstateUpdater","scraper")
 
 class UpdateRealEstate(BaseScraper):
     
-    def __init__(self,*args,**kwargs):
+    def __init__(self,*args,use_http = True,**kwargs):
         super().__init__(*args,**kwargs)
         self.db = DbManagerV1(table_name="jp_realestate_v1")
-        
+        # liveness is probed over plain http , a browser tab only opens for ambiguous answers
+        self.http_extractor = HttpListingExtractor(limiter=self.limiter) if use_http else None
+
+    async def close_browser(self):
+        if self.http_extractor:
+            res_updater.info(f"Liveness probes : {self.http_extractor.metrics()['probes']}")
+            await self.http_extractor.aclose()
+        await super().close_browser()
+
     async def update_card(self,listing_ids,urls,start_browser = True):
         if start_browser:
             await self.start_browser()
 
-        async def handle_update(listing_id,url,index):
-            page = await self.context.new_page()
-
-            try:
-
-                await page.goto(url,timeout=15000,wait_until="domcontentloaded")
-                res_updater.info(f"{index} Opened url : {url}")
-
-                if listing_id is None:
-                    res_updater.warning(f"{index} No db entry found for {url}")
-                    return
+        # outcomes are collected here and written in one statement per batch , off the event loop
+        outcomes = []
 
-                element = await page.query_selector(EXPIRED)
-                if element:
-                    res_updater.info(f"{index} Expired message detected : {url}")
-                    self.db.update_status(listing_id,"expired")
-                else:
-                    self.db.update_status(listing_id, "active")
-                    res_updater.info(f"{index} is live")
+        async def handle_update(listing_id,url,index,slot):
+            async with self.pages.page() as page:
 
-                self.db.update_last_update(listing_id) #todo: update data in update_status
+                try:
 
-            except Exception as e:
-                res_updater.exception(f"Error during update:{e}")
+                    response = await page.goto(url,timeout=15000,wait_until="domcontentloaded")
+                    slot.status = response.status if response else None
+                    res_updater.info(f"{index} Opened url : {url}")
 
-            finally:
-                await page.close()
+                    if listing_id is None:
+                        res_updater.warning(f"{index} No db entry found for {url}")
+                        return
 
-        sem = asyncio.Semaphore(5)
+                    element = await page.query_selector(EXPIRED)
+                    if element:
+                        res_updater.info(f"{index} Expired message detected : {url}")
+                        outcomes.append((listing_id,"expired"))
+                    else:
+                        outcomes.append((listing_id,"active"))
+                        res_updater.info(f"{index} is live")
+
+                except Exception as e:
+                    slot.error = e
+                    res_updater.exception(f"Error during update:{e}")
+                    if listing_id is not None:
+                        # status None only bumps last_update , a failing listing is not ranked first again next cycle
+                        outcomes.append((listing_id,None))
 
         async def limit_task(i, listing_id, url):
-            async with sem:
-                await handle_update(listing_id=listing_id, url=url, index=i)
+            if self.http_extractor and listing_id is not None:
+                status = await self.http_extractor.probe(url)
+                if status is not None:
+                    outcomes.append((listing_id,status))
+                    res_updater.info(f"{i} is {status} (http) : {url}")
+                    return
+
+            # adaptive per-domain concurrency , see scraper/core/rate_limiter.py
+            async with self.limiter.slot(url) as slot:
+                await handle_update(listing_id=listing_id, url=url, index=i, slot=slot)
 
         await asyncio.gather(
             *(limit_task(i, listing_id, url) for i, (listing_id, url) in enumerate(zip(listing_ids, urls)))
         )
 
+        await asyncio.to_thread(self.db.update_status_bulk,outcomes)
+
         if start_browser:
-            self.db.close_conn()
             await self.close_browser()
 
-    async def continuous_update(self, interval_sec=300,batch_wise = True , max_batches = 1):
+    async def continuous_update(self, interval_sec=300,batch_wise = True , max_batches = 1 , min_pause_sec = 30):
+        # min_pause_sec : pause before re-ranking after a full budget , so a failing site is never crawled back to back
         await self.start_browser()
 
         BATCH_SIZE = 100
@@ -69,33 +90,25 @@ class UpdateRealEstate(BaseScraper):
             while True:
                 res_updater.info("Starting update cycle")
 
-                df = self.db.get_active_ids()
-
-                #make urls
-                df["source_listing_id"] = df["source_listing_id"].apply(lambda ids : f"https://realestate.co.jp/en/forsale/view/{ids}")
-
-                listing_ids = df["id"].tolist()
-                urls = df["source_listing_id"].tolist()
-
-                if not listing_ids or not urls: #todo:maybe close the updater
-                    res_updater.warning("No active listing found")
-                    if batch_wise:
-                        break
-                    await asyncio.sleep(interval_sec)
-                    continue
-
-                for start in range(0, len(listing_ids), BATCH_SIZE):
-                    end = min(start + BATCH_SIZE, len(listing_ids))
+                # highest priority first (see DbManagerV1.refresh_queue) , ranked and read into a list in one
+                # to_thread call before any browser work , every cycle is capped at max_batches batches
+                budget = BATCH_SIZE * max_batches
+                queue = await asyncio.to_thread(self.db.refresh_queue,"status",budget)
+                batch_number = 0
+                for start in range(0,len(queue),BATCH_SIZE):
+                    batch = queue[start:start + BATCH_SIZE]
+                    #make urls
+                    listing_ids = [row["id"] for row in batch]
+                    urls = [listing_url(row["source_listing_id"]) for row in batch]
 
                     await self.update_card(
-                        listing_ids=listing_ids[start:end],
-                        urls=urls[start:end],
+                        listing_ids=listing_ids,
+                        urls=urls,
                         start_browser=False
                     )
 
-                    self.db.conn.commit()
-
-                    batch_number = start // BATCH_SIZE + 1
+                    batch_number += 1
+                    end = start + len(listing_ids)
 
                     res_updater.info(
                         f"Finished batch {batch_number} "
@@ -105,7 +118,16 @@ class UpdateRealEstate(BaseScraper):
                         res_updater.info(f"Stopped the updater after {batch_number}")
                         return
 
+                if batch_number == 0: #todo:maybe close the updater
+                    res_updater.warning("No active listing found")
+                    if batch_wise:
+                        break
+
 
+                if len(queue) == budget:
+                    # a full budget means more listings are due , rank the next budget after a short pause
+                    await asyncio.sleep(min(min_pause_sec,interval_sec))
+                    continue
                 await asyncio.sleep(interval_sec)
 
         except KeyboardInterrupt:
@@ -114,7 +136,6 @@ class UpdateRealEstate(BaseScraper):
             res_updater.exception(f"Error {e}")
 
         finally:
-            self.db.close_conn()
             await self.close_browser()
 
 
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from scraper.japan.realestate.runner import RealestateScraperRunner
+from manage_db.frontier_db_manager import CrawlFrontier
+from scraper.core.raw_archive import new_run_id
+
+from utils.logger import get_logger
+
+res_log = get_logger("RealestateWorkers","scraper")
+
+# Sharded scraping : listings are sharded through the crawl_frontier table , each worker process runs
+# its own browser and claims rows with FOR UPDATE SKIP LOCKED . The coordinator harvests the result
+# pages , starts the local workers and reports progress . More hosts join by running
+# `python -m scraper.japan.realestate.workers --worker-only` against the same database .
+# Each process has its own adaptive limiter , so the per-domain ceiling applies per process :
+# size SCRAPER_MAX_CONCURRENCY / SCRAPER_DOMAIN_CEILINGS for the total you want on the site .
+
+def worker_main(index,idle_sec,detail_workers,table_name,source,run_id):
+    res_log.info(f"worker {index} starting")
+    # each process appends to its own raw archive file (pid in the name) of the coordinator's run
+    runner = RealestateScraperRunner(detail_workers=detail_workers,table_name=table_name,source=source,run_id=run_id)
+    asyncio.run(runner.work(idle_sec=idle_sec))
+    res_log.info(f"worker {index} stopped")
+
+
+class ScraperCoordinator:
+    def __init__(self,processes = 4,detail_workers = None,idle_sec = 30,report_sec = 10,
+                 table_name = "jp_realestate_v1",source = "realestate.co"):
+        self.processes = processes
+        self.detail_workers = detail_workers
+        self.idle_sec = idle_sec
+        self.report_sec = report_sec
+        self.table_name = table_name
+        self.source = source
+        self.frontier = CrawlFrontier(source)
+
+    def start_workers(self,run_id):
+        # spawn : every worker starts its own interpreter , playwright and db pool
+        ctx = multiprocessing.get_context("spawn")
+        procs = []
+        for index in range(self.processes):
+            proc = ctx.Process(
+                target=worker_main,
+                args=(index,self.idle_sec,self.detail_workers,self.table_name,self.source,run_id),
+                name=f"scraper-worker-{index}",
+            )
+            proc.start()
+            procs.append(proc)
+        return procs
+
+    async def report(self,procs,harvest_done,stats):
+        start = time.monotonic()
+        last_done = None
+        while True:
+            progress = await asyncio.to_thread(self.frontier.progress)
+            alive = sum(proc.is_alive() for proc in procs)
+            elapsed = time.monotonic() - start
+
+            rate = ""
+            if last_done is not None:
+                rate = f" , {(progress['done'] - last_done) / self.report_sec:.1f} listings/s"
+            last_done = progress["done"]
+            res_log.info(f"[{elapsed:.0f}s] workers alive {alive}/{len(procs)} , frontier {progress}{rate}")
+
+            # drained : the harvest is over and nothing is left to claim or in progress
+            if harvest_done.is_set() and progress["pending"] == 0 and progress["claimed"] == 0 and "drained_after" not in stats:
+                stats["drained_after"] = elapsed
+            stats["progress"] = progress
+
+            if alive == 0:
+                return
+            await asyncio.sleep(self.report_sec)
+
+    async def run(self,building_type = None,max_pages = 1,incremental = False,harvest = True):
+        """
+        Harvests (unless harvest = False) while the workers drain the frontier .
+        Returns {"progress" , "drained_after" , "elapsed"} .
+        """
+        await asyncio.to_thread(self.frontier.create_tables)
+        start = time.monotonic()
+
+        # one raw archive run for all local workers , iter_records(runs="latest") reads them together
+        run_id = new_run_id()
+        procs = self.start_workers(run_id)
+        harvest_done = asyncio.Event()
+        stats = {}
+        reporter = asyncio.create_task(self.report(procs,harvest_done,stats))
+
+        try:
+            if harvest:
+                harvester = RealestateScraperRunner(table_name=self.table_name,source=self.source,json_file=None)
+                try:
+                    await harvester.harvest_only(building_type,max_pages,incremental)
+                except Exception as e:
+                    res_log.error(f"Harvest error : {e}")
+            harvest_done.set()
+
+            for proc in procs:
+                await asyncio.to_thread(proc.join)
+        finally:
+            for proc in procs:
+                if proc.is_alive():
+                    proc.terminate()
+            await reporter
+
+        stats["elapsed"] = time.monotonic() - start
+        res_log.info(f"Sharded crawl finished : {stats}")
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count() // 2 or 1)
+    parser.add_argument("--detail-workers", type=int, default=None, help="detail tasks per process")
+    parser.add_argument("--max-pages", type=int, default=5)
+    parser.add_argument("--building-type", default=None)
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--idle-sec", type=int, default=30)
+    parser.add_argument("--worker-only", action="store_true", help="only drain the shared frontier (extra hosts)")
+    args = parser.parse_args()
+
+    coordinator = ScraperCoordinator(processes=args.processes,detail_workers=args.detail_workers,idle_sec=args.idle_sec)
+    asyncio.run(coordinator.run(
+        building_type=args.building_type,
+        max_pages=args.max_pages,
+        incremental=args.incremental,
+        harvest=not args.worker_only,
+    ))
@@ -1,4 +1,5 @@
 CARDS = '//div[starts-with(@id, "property-")]'
+CARDS_CSS = 'div[id^="property-"]'
 DETAILS_LINK = "a.absolute.inset-0.z-10"
 
 INFO_TABLE = ".flex-1.grid.gap-2"
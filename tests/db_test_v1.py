@@ -1,10 +1,15 @@
 import json
+from itertools import islice
 from pathlib import Path
 from fastapi.responses import JSONResponse
 from data.data_cleaner.to_json_safe import DateTimeEncoder
 from manage_db.db_manager_v1 import DbManagerV1
+from scraper.core.raw_archive import iter_records
+from manage_db.history_db_manager import ListingHistory
+from manage_db.query import PropertyQuery,build_property_query,query_property_page,MAX_PAGE_SIZE
 
 from psycopg2.extras import RealDictCursor
+from pydantic import ValidationError
 import pytest
 from sqlalchemy import text
 
@@ -13,11 +18,20 @@ from sqlalchemy import text
 def db():
     db_logic = DbManagerV1("jp_realestate")
     yield db_logic
-    db_logic.close_conn()
 
 def test_conn(db):
-    assert db.conn is not None
-    assert db.cursor is not None
+    with db.pool.connection() as conn:
+        assert conn is not None
+        assert not conn.closed
+
+def test_pool_reuse(db):
+    with db.cursor() as cur:
+        cur.execute("SELECT 1 AS one;")
+        assert cur.fetchone()["one"] == 1
+    metrics = db.pool.metrics()
+    assert metrics["checked_out"] == 0
+    assert metrics["idle"] >= 1
+    assert metrics["requests"] >= 1
 
 def test_engine_connectivity(db):
     engine = db.get_db_engine()
@@ -30,27 +44,70 @@ def test_json_1():
     # value returned from scraper .
     root = Path(__file__).parents[1].resolve()
 
-    json_path = root / "data" / "raw" / "real_estate.json"
-
-    with open(json_path,'r',encoding="utf-8-sig") as f:
-        loaded_data = json.load(f)
+    # latest run of the raw archive , streamed , only the first records are held in memory
+    records = list(islice(iter_records(root / "data" / "raw","real_estate"),100))
+    assert records
 
-    response = JSONResponse(loaded_data)
+    response = JSONResponse(records)
 
     assert response.body is not None
     assert len(response.body) > 0
 
 def test_json_2():
     db = DbManagerV1(None,None)
-    conn = db.conn
 
     query = "SELECT * FROM jp_realestate_v1 LIMIT 10;"
 
-    with conn.cursor(cursor_factory=RealDictCursor) as cur :
+    with db.cursor(cursor_factory=RealDictCursor) as cur :
         cur.execute(query)
         result = cur.fetchall()
     json_data = json.dumps(result,cls=DateTimeEncoder)
     assert json_data is not None
     assert len(json_data) > 0
 
-# todo: make test of query builder .
+# --query builder--
+
+def test_query_builder_sort(db):
+    q = PropertyQuery(sort_by="size",sort_order="desc",min_size=40)
+    query,params = build_property_query(q,"jp_realestate_v1")
+    with db.pool.connection() as conn:
+        text_query = query.as_string(conn)
+    assert "jsonb_numeric(p.data,'size') DESC NULLS LAST" in text_query
+    assert "p.id DESC" in text_query
+    assert params["min_size"] == 40
+
+def test_query_builder_unknown_sort(db):
+    q = PropertyQuery(sort_by="price_yen; DROP TABLE users")
+    query,_ = build_property_query(q,"jp_realestate_v1")
+    with db.pool.connection() as conn:
+        text_query = query.as_string(conn)
+    assert "p.last_update ASC NULLS LAST" in text_query
+
+def test_keyset_pages_do_not_overlap():
+    q = PropertyQuery(limit=5,sort_by="size",sort_order="asc")
+    first,cursor = query_property_page(q,"jp_realestate_v1")
+    assert len(first) <= 5
+    if cursor is None:
+        return
+    second,_ = query_property_page(q.model_copy(update={"cursor":cursor}),"jp_realestate_v1")
+    assert not {row["id"] for row in first} & {row["id"] for row in second}
+    assert all("_sort_key" not in row for row in first + second)
+
+@pytest.mark.parametrize("limit",[0,-1,MAX_PAGE_SIZE + 1])
+def test_page_size_out_of_bounds(limit):
+    with pytest.raises(ValidationError):
+        PropertyQuery(limit=limit)
+
+def test_page_size_bounds():
+    rows,_ = query_property_page(PropertyQuery(limit=1),"jp_realestate_v1")
+    assert len(rows) <= 1
+    rows,_ = query_property_page(PropertyQuery(limit=MAX_PAGE_SIZE),"jp_realestate_v1")
+    assert len(rows) <= MAX_PAGE_SIZE
+
+# --listing history--
+
+def test_price_drops():
+    history = ListingHistory("jp_realestate_v1")
+    drops = history.price_drops(days=30,limit=10)
+    assert len(drops) <= 10
+    assert all(row["price_now"] < row["price_before"] for row in drops)
@@ -1,6 +1,7 @@
 import pytest
 import pytest_asyncio
 from scraper.japan.realestate.logic import RealestateScraperLogic
+from scraper.japan.realestate.http_extractor import parse_listing_html
 
 @pytest_asyncio.fixture
 async def scraper():
@@ -21,4 +22,31 @@ async def test_data_extraction(scraper):
     data = await scraper.collect_data(ids , {1297687})
     assert isinstance(data, list)
     assert all(isinstance(d, dict) for d in data)
-    assert "price_yen" in data[0]
\ No newline at end of file
+    assert "price_yen" in data[0]
+
+@pytest.mark.asyncio
+async def test_http_extraction(scraper):
+    ids = await scraper.get_cards_id("https://realestate.co.jp/en/forsale?page=1")
+    data = await scraper.http_extractor.extract(f"https://realestate.co.jp/en/forsale/view/{ids[0]}")
+    # None means the browser fallback is needed , otherwise same shape as extract_listing
+    assert data is None or ("Price" in data and "images" in data)
+
+@pytest.mark.asyncio
+async def test_liveness_probe(scraper):
+    ids = await scraper.get_cards_id("https://realestate.co.jp/en/forsale?page=1")
+    # a listing on the results page is live , None only when the browser has to decide
+    status = await scraper.http_extractor.probe(f"https://realestate.co.jp/en/forsale/view/{ids[0]}")
+    assert status in ("active", None)
+
+def test_parse_listing_client_side_gallery():
+    # gallery trigger without thumbnails in the html : static fields are kept , images are left to the metadata updater
+    page = b"""<html><body>
+    <h4 class="text-xl">Minato-ku , Tokyo</h4>
+    <div class="property-details"><span class="property-details-title">Size</span><span class="property-details-content">45 m2</span></div>
+    <div class="property-additional-details"><span class="property-additional-details-title">Price</span><span class="property-additional-details-content">30,000,000 yen</span></div>
+    <figure class="cursor-pointer"><img src="cover.jpg"></figure>
+    </body></html>"""
+    data = parse_listing_html(page)
+    assert data["Location"] == "Minato-ku , Tokyo"
+    assert data["Price"] == "30,000,000 yen"
+    assert data["images"] == []